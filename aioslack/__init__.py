@@ -6,6 +6,9 @@
 __version__ = "0.6.0"
 
 from .core import Slack, SlackError
+from .events import Receiver
+from .pool import SlackPool
+from .shard import Supervisor
 from .types import (
     Channel,
     Conversation,
@@ -14,6 +17,7 @@ from .types import (
     File,
     Group,
     IM,
+    LazyEvent,
     MPIM,
     Profile,
     RTMStart,
@@ -0,0 +1,52 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Pluggable JSON decoding for Web API responses and RTM events.
+"""
+
+import json
+from typing import Any, Callable, Union
+
+Loads = Callable[[Union[str, bytes]], Any]
+
+DECODERS = ("orjson", "ujson", "json")
+
+
+def get_loads(name: str = "json") -> Loads:
+    """
+    Get a JSON decoding function by module name: json, orjson, or ujson.
+
+    The name auto picks the fastest decoder installed.
+    """
+    if name == "auto":
+        for candidate in DECODERS:
+            try:
+                return get_loads(candidate)
+            except ImportError:
+                continue
+
+    if name == "json":
+        return json.loads
+    if name == "orjson":
+        import orjson
+
+        return orjson.loads
+    if name == "ujson":
+        import ujson
+
+        return ujson.loads
+
+    raise ValueError(f"unknown JSON decoder {name!r}, try one of {DECODERS}")
+
+
+def response_loads(loads: Loads) -> Loads:
+    """Wrap a decoder to rename the `self` key of API responses to `self_`."""
+
+    def decode(data: Union[str, bytes]) -> Any:
+        value = loads(data)
+        if isinstance(value, dict) and "self" in value:
+            value["self_"] = value.pop("self")
+        return value
+
+    return decode
@@ -3,16 +3,88 @@
 
 import asyncio
 import logging
+import random
 import re
-from typing import cast, Any, AsyncIterator, Match
+import time
+import warnings
+from typing import (
+    cast,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Match,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 import aiohttp
+from aiohttp import ClientError, WSMsgType
+from attr import asdict, dataclass, evolve, has
 
-from .state import Cache
-from .types import Auto, Channel, Event, Group, User, Response, RTMStart
+from . import snapshot
+from .codec import get_loads, response_loads
+from .dispatch import Dispatcher, Handler
+from .ratelimit import Limiter, idempotent
+from .sender import Sender
+from .state import (
+    Cache,
+    Membership,
+    ResponseCache,
+    RESPONSE_TTLS,
+    user_aliases,
+    usergroup_aliases,
+)
+from .types import (
+    Auto,
+    Channel,
+    Conversation,
+    Event,
+    Group,
+    IM,
+    LazyEvent,
+    MPIM,
+    User,
+    UserGroup,
+    Response,
+    RTMStart,
+    compact as compact_type,
+)
+
+T = TypeVar("T")
 
 log = logging.getLogger(__name__)
 
+# special mentions that encode() turns into <!name>
+SPECIALS = ("here", "everyone", "channel")
+
+# policies for full rtm buffers
+OVERFLOW = ("block", "drop_oldest")
+
+# response key and item type for cursor-paginated methods
+PAGINATED: Dict[str, Tuple[str, Optional[Type[Auto]]]] = {
+    "channels.list": ("channels", Channel),
+    "conversations.history": ("messages", None),
+    "conversations.list": ("channels", Conversation),
+    "conversations.members": ("members", None),
+    "conversations.replies": ("messages", None),
+    "groups.list": ("groups", Group),
+    "im.list": ("ims", IM),
+    "mpim.list": ("groups", MPIM),
+    "reactions.list": ("items", None),
+    "users.conversations": ("channels", Conversation),
+    "users.list": ("members", User),
+}
+
 
 class SlackError(Exception):
     """
@@ -24,28 +96,119 @@ class SlackError(Exception):
         self.context = context
 
 
+@dataclass
+class RTMStats:
+    connects: int = 0
+    reconnects: int = 0
+    last_reconnect: float = 0.0
+    reconnect_time: float = 0.0
+    queued: int = 0
+    max_queued: int = 0
+    dropped: int = 0
+    errors: int = 0
+
+
+def backoff(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter, in seconds, for the given attempt."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
 class Slack:
     """
     Slack API entry point.
+
+    With compact, cached channels, users, and groups use the slotted,
+    memory-compact variants of their types.  The decoder names the JSON
+    module used for API responses and events: json, orjson, ujson, or auto.
+
+    Given a session, the client sends its token with each request rather than
+    creating its own HTTP session, and leaves the session open on close();
+    see SlackPool for sharing one session between many tokens.
+
+    With responses, calls to read-only methods are cached and coalesced by
+    method and arguments; pass True for the default per-method TTLs from
+    RESPONSE_TTLS, or a mapping of method names to TTLs in seconds.
     """
 
-    def __init__(self, token: str) -> None:
+    def __init__(
+        self,
+        token: str,
+        *,
+        retries: int = 3,
+        compact: bool = False,
+        decoder: str = "json",
+        session: aiohttp.ClientSession = None,
+        responses: Union[bool, Mapping[str, float]] = False,
+    ) -> None:
         self.token: str = token
-        self.session = aiohttp.ClientSession(
-            headers={"Authorization": f"Bearer {self.token}"}
-        )
+        self.retries = retries
+        self.loads = get_loads(decoder)
+        self.response_loads = response_loads(self.loads)
+        self.limiter = Limiter()
+        headers = {"Authorization": f"Bearer {self.token}"}
+        self.options: Dict[str, Any] = {}
+        self.owns_session = session is None
+        if session is None:
+            session = aiohttp.ClientSession(headers=headers)
+        else:
+            self.options["headers"] = headers
+        self.session = session
+        self.responses: Optional[ResponseCache] = None
+        if responses:
+            ttls = RESPONSE_TTLS if responses is True else responses
+            self.responses = ResponseCache(cast(Mapping[str, float], ttls))
 
         self.me: Auto = Auto()
         self.team: Auto = Auto()
-        self.channels = Cache(Channel, "channels.info")
-        self.users = Cache(User, "users.info")
-        self.groups = Cache(Group, "groups.info")
+        types = (Channel, User, Group, UserGroup)
+        if compact:
+            types = tuple(compact_type(t) for t in types)
+        channel, user, group, usergroup = types
+        self.channels = Cache(channel, "channels.info", api=self.api)
+        self.users = Cache(user, "users.info", aliases=user_aliases, api=self.api)
+        self.groups = Cache(group, "groups.info", api=self.api, param="channel")
+        self.usergroups = Cache(usergroup, aliases=usergroup_aliases)
+        self.usergroup_members = Membership()
+        self.channel_members = Membership()
+        self.warm = False
+        self.rtm_stats = RTMStats()
+        self.dispatcher = Dispatcher()
+        self.sender = Sender(self.api, encode=self.encode)
+        self.updaters: Dict[str, Callable[[Event], None]] = {
+            "team_join": self.update_user,
+            "user_change": self.update_user,
+            "channel_created": self.update_channel,
+            "channel_joined": self.update_channel,
+            "channel_rename": self.update_channel,
+            "channel_archive": self.archive_channel,
+            "channel_unarchive": self.archive_channel,
+            "channel_deleted": self.delete_channel,
+            "channel_left": self.leave_channel,
+            "group_joined": self.update_channel,
+            "group_rename": self.update_channel,
+            "group_archive": self.archive_channel,
+            "group_unarchive": self.archive_channel,
+            "group_left": self.delete_channel,
+            "member_joined_channel": self.add_member,
+            "member_left_channel": self.remove_member,
+            "subteam_created": self.update_usergroup,
+            "subteam_updated": self.update_usergroup,
+            "subteam_members_changed": self.update_usergroup_members,
+        }
+
+        self.closed = False
+        self.closing: Optional[asyncio.Event] = None
+        self.websockets: Set[aiohttp.ClientWebSocketResponse] = set()
+        self.tasks: Set[asyncio.Future] = set()
+        self.requests: Set[asyncio.Future] = set()
 
-        self.decode_re = re.compile(r"<(?:@(?P<userid>\w+)|!(?P<alias>\w+))>")
+        self.decode_re = re.compile(r"<([@#!]?)([^|>]*)(?:\|([^>]*))?>")
+        self.decoders: Dict[str, Callable[[Match], str]] = {}
         self.encode_re = re.compile(r"@(?P<name>\w+)")
 
     def __del__(self) -> None:
-        asyncio.ensure_future(self.close())
+        if not getattr(self, "closed", True):
+            warnings.warn(f"unclosed Slack client {self!r}", ResourceWarning)
 
     async def __aenter__(self) -> "Slack":
         return self
@@ -53,20 +216,118 @@ class Slack:
     async def __aexit__(self, *args) -> None:
         await self.close()
 
-    async def close(self) -> None:
-        # TODO: track RTM sessions as tasks and cancel them here
-        await self.session.close()
+    @property
+    def connections(self) -> int:
+        """Number of open RTM websockets."""
+        return len(self.websockets)
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """
+        Close RTM sessions and the HTTP session, unless the session is shared.
+
+        Queued messages are posted first, then websockets are closed, ending
+        any rtm() streams, including those waiting to reconnect; buffered rtm
+        readers and in-flight API calls then get up to timeout seconds to
+        finish before they are cancelled.
+        """
+        await self.sender.stop(timeout)
+        self.closed = True
+        if self.closing is not None:
+            self.closing.set()
+
+        for ws in list(self.websockets):
+            await ws.close()
+
+        tasks = self.tasks | self.requests
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                log.warning(f"cancelled {len(pending)} tasks while closing")
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        await self.dispatcher.stop(drain=False)
+        if self.owns_session:
+            await self.session.close()
+
+    async def pause(self, delay: float) -> None:
+        """Sleep for delay seconds, or until the client is closed."""
+        if self.closing is None:
+            # created on first use, so it belongs to the running loop
+            self.closing = asyncio.Event()
+        try:
+            await asyncio.wait_for(self.closing.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def track(
+        self, tasks: Set[asyncio.Future], coro: Awaitable[T]
+    ) -> "asyncio.Future[T]":
+        """Run a coroutine as a task in the given set until it finishes."""
+        task = asyncio.ensure_future(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
 
     async def api(self, method: str, **kwargs: str) -> Auto:
-        async with self.session.post(
-            f"https://slack.com/api/{method}", data=kwargs
-        ) as request:
-            if request.status != 200:
-                raise SlackError(f"{method} returned status {request.status}")
-
-            value = await request.json()
-            if "self" in value:
-                value["self_"] = value.pop("self")
+        """
+        Call a Web API method, waiting for the method's rate limit tier.
+
+        Rate limited calls are retried after the Retry-After delay, and
+        idempotent methods are also retried after server or network errors.
+        Responses from cached methods may be shared with other callers.
+        """
+        if self.closed:
+            raise SlackError(f"{method} called on closed client")
+        if self.responses is not None and method in self.responses:
+            return await self.responses.get(
+                method,
+                kwargs,
+                lambda: self.track(self.requests, self.call(method, kwargs)),
+            )
+        return await self.track(self.requests, self.call(method, kwargs))
+
+    async def call(self, method: str, kwargs: Dict[str, str]) -> Auto:
+        attempt = 0
+        while True:
+            await self.limiter.acquire(method)
+            try:
+                async with self.session.post(
+                    f"https://slack.com/api/{method}", data=kwargs, **self.options
+                ) as request:
+                    if request.status == 429 and attempt < self.retries:
+                        retry_after = float(request.headers.get("Retry-After", 1))
+                        self.limiter.throttle(method, retry_after)
+                        attempt += 1
+                        self.limiter.stats.retries += 1
+                        continue
+
+                    if (
+                        request.status >= 500
+                        and idempotent(method)
+                        and attempt < self.retries
+                    ):
+                        log.warning(f"{method} returned status {request.status}")
+                        attempt += 1
+                        self.limiter.stats.retries += 1
+                        await asyncio.sleep(backoff(attempt))
+                        continue
+
+                    if request.status != 200:
+                        raise SlackError(f"{method} returned status {request.status}")
+
+                    value = self.response_loads(await request.read())
+
+            except (ClientError, asyncio.TimeoutError) as e:
+                if not idempotent(method) or attempt >= self.retries:
+                    raise
+                log.warning(f"{method} failed: {e!r}")
+                attempt += 1
+                self.limiter.stats.retries += 1
+                await asyncio.sleep(backoff(attempt))
+                continue
+
             response = Response.generate(value, recursive=False)
             if not response.ok:
                 raise SlackError(
@@ -76,58 +337,627 @@ class Slack:
                 log.warning(f'{method} warning: "{response.warning}"')
             return response
 
-    async def rtm(self) -> AsyncIterator[Event]:
-        """Connect to the realtime event API and start yielding events."""
+    async def send(
+        self, channel: str, text: str, *, coalesce: bool = True, **kwargs: Any
+    ) -> Auto:
+        """
+        Post a message through the outbound queue, after encoding @mentions.
+
+        Messages to a channel are posted in order, no more than once a second,
+        and rapid-fire messages with the same options are joined into one post
+        unless coalesce is False.
+        """
+        if self.closed:
+            raise SlackError("send called on closed client")
+        return await self.sender.send(channel, text, coalesce=coalesce, **kwargs)
+
+    async def paginate(
+        self,
+        method: str,
+        *,
+        key: str = None,
+        kind: Type[Auto] = None,
+        limit: int = 200,
+        **kwargs: str,
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate over the items of a cursor-paginated list method.
+
+        The next page is requested while the caller works through the current
+        one, and items are only built into objects as they are yielded.
+        """
+        if key is None:
+            if method not in PAGINATED:
+                raise SlackError(f"{method} is not a known paginated method")
+            key, default = PAGINATED[method]
+            kind = kind or default
+
+        kwargs["limit"] = str(limit)
+        pending: Optional[asyncio.Future] = asyncio.ensure_future(
+            self.api(method, **kwargs)
+        )
+        try:
+            while pending is not None:
+                response = await pending
+                pending = None
+
+                metadata = getattr(response, "response_metadata", None) or {}
+                cursor = metadata.get("next_cursor")
+                if cursor:
+                    kwargs["cursor"] = cursor
+                    pending = asyncio.ensure_future(self.api(method, **kwargs))
+
+                for item in response[key]:
+                    if kind is not None:
+                        yield kind.build(item)
+                    elif isinstance(item, Mapping):
+                        yield Auto.generate(item, key.title(), recursive=False)
+                    else:
+                        yield item
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def save(self, path: str = None) -> None:
+        """Save the cached workspace state to disk, for load() at startup."""
+        data = {
+            "version": snapshot.VERSION,
+            "saved": time.time(),
+            "me": asdict(self.me) if has(type(self.me)) else {},
+            "team": asdict(self.team) if has(type(self.team)) else {},
+            "channels": [self.dump_channel(value) for value in self.channels.values()],
+            "users": [asdict(value) for value in self.users.values()],
+            "groups": [self.dump_channel(value) for value in self.groups.values()],
+        }
+        path = path or snapshot.default_path(self.token)
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, snapshot.write, path, data)
+
+    async def load(
+        self, path: str = None, *, max_age: float = 3600, refresh: bool = False
+    ) -> bool:
+        """
+        Fill the caches from a snapshot saved less than max_age seconds ago.
+
+        Once loaded, the caches are warm, and rtm() will connect without
+        rtm.start.  With refresh, users and conversations that changed while
+        the snapshot was on disk are then fetched by refresh() in the
+        background; it lists the whole workspace, so it can take minutes on
+        large workspaces.
+        """
+        path = path or snapshot.default_path(self.token)
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(None, snapshot.read, path, max_age)
+        if data is None:
+            return False
+
+        self.me = Auto.generate(data["me"], "Me", recursive=False)
+        self.team = Auto.generate(data["team"], "Team", recursive=False)
+        self.channels.fill(self.channels.type.build(item) for item in data["channels"])
+        self.groups.fill(self.groups.type.build(item) for item in data["groups"])
+        self.index_members(self.channels.values())
+        self.index_members(self.groups.values())
+        for item in data["users"]:
+            existing = self.users.cache.get(item["id"])
+            if existing is None or existing.updated < item["updated"]:
+                self.users[item["id"]] = self.users.type.build(item)
+        self.warm = True
+
+        log.debug(
+            f"loaded {len(self.users)} users, {len(self.channels)} channels "
+            f"and {len(self.groups)} groups from {path}"
+        )
+
+        async def background() -> None:
+            try:
+                await self.refresh()
+            except (ClientError, asyncio.TimeoutError, SlackError) as e:
+                log.warning(f"failed to refresh loaded snapshot: {e!r}")
+
+        if refresh:
+            self.track(self.tasks, background())
+        return True
+
+    async def refresh(self) -> None:
+        """
+        Fetch users and conversations that changed since the caches were filled.
+
+        Users listed with a newer updated timestamp replace the cached ones.
+        Channels, groups, and multiparty IMs are rebuilt from
+        conversations.list, and dropped if no longer listed; any whose member
+        count no longer matches the membership index lose their member list,
+        as it can't be trusted.  Both methods are tier 2, so on workspaces
+        with tens of thousands of users this mostly waits on rate limits.
+        """
+        users = 0
+        async for user in self.paginate("users.list", kind=self.users.type):
+            existing = self.users.cache.get(user.id)
+            if existing is None or existing.updated < user.updated:
+                self.users[user.id] = user
+                users += 1
+
+        listed: Set[str] = set()
+        async for conversation in self.paginate(
+            "conversations.list",
+            types="public_channel,private_channel,mpim",
+            exclude_archived="false",
+        ):
+            cache = self.groups if conversation.is_private else self.channels
+            cache[conversation.id] = cache.type.build(asdict(conversation))
+            listed.add(conversation.id)
+            if (
+                conversation.id in self.channel_members
+                and len(self.channel_members.members(conversation.id))
+                != conversation.num_members
+            ):
+                self.channel_members.remove(conversation.id)
+
+        for cache in (self.channels, self.groups):
+            for key in [key for key in cache.cache if key not in listed]:
+                del cache[key]
+                self.channel_members.remove(key)
+
+        log.debug(f"refreshed {users} users and {len(listed)} conversations")
+
+    async def connect(self) -> str:
+        """
+        Start an RTM session and return its websocket URL.
+
+        The first session uses rtm.start to fill the channel, user, and group
+        caches; once they are warm, the lighter rtm.connect is used instead.
+        """
+        if self.warm:
+            response = await self.api("rtm.connect")
+            self.me = Auto.generate(response.self_, "Me", recursive=False)
+            self.team = Auto.generate(response.team, "Team", recursive=False)
+            return response["url"]
+
         response = cast(RTMStart, await self.api("rtm.start"))
 
         self.me = Auto.generate(response.self_, "Me", recursive=False)
         self.team = Auto.generate(response.team, "Team", recursive=False)
-        self.channels.fill(Channel.build(item) for item in response.channels)
-        self.users.fill(User.build(item) for item in response.users)
-        self.groups.fill(Group.build(item) for item in response.groups)
+        self.channels.fill(self.channels.type.build(item) for item in response.channels)
+        self.users.fill(self.users.type.build(item) for item in response.users)
+        self.groups.fill(self.groups.type.build(item) for item in response.groups)
+        self.index_members(self.channels.values())
+        self.index_members(self.groups.values())
+        self.warm = True
 
         log.debug(
             f"received {len(self.users)} users, {len(self.channels)} channels "
             f"and {len(self.groups)} groups from rtm.start"
         )
 
-        async with self.session.ws_connect(response["url"]) as ws:
-            async for msg in ws:
-                event: Event = Event.generate(msg.json(), recursive=False)
+        return response["url"]
 
-                if event.type == "goodbye":
-                    break
+    async def rtm(
+        self,
+        *,
+        reconnect: bool = False,
+        update: bool = False,
+        types: Iterable[str] = None,
+        buffer: int = 0,
+        overflow: str = "block",
+        droppable: Iterable[str] = (),
+    ) -> AsyncIterator[Event]:
+        """
+        Connect to the realtime event API and start yielding events.
+
+        With reconnect, the stream survives goodbye events and dropped
+        connections, reconnecting with jittered exponential backoff after
+        failures; reconnect counts and latency are tracked in rtm_stats.
+
+        With update, events that change users, channels, or groups are
+        applied to their caches before being yielded.
+
+        Events are yielded as LazyEvent objects; given types, only events of
+        those types are built and yielded, and everything else is skipped.
 
+        With buffer, the websocket is read by a separate task into a queue of
+        that size, so a slow consumer doesn't stall the connection.  When the
+        queue is full, droppable event types (eg, user_typing) are discarded,
+        and other events either wait (overflow="block") or push out the
+        oldest queued event (overflow="drop_oldest").
+        """
+        events = self.stream(reconnect=reconnect, update=update, types=types)
+        if not buffer:
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+            return
+
+        if overflow not in OVERFLOW:
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+
+        queue: asyncio.Queue = asyncio.Queue(buffer)
+        drop = frozenset(droppable)
+        errors: List[Exception] = []
+
+        async def read() -> None:
+            try:
+                async for event in events:
+                    await self.enqueue(queue, event, overflow, drop)
+            except asyncio.CancelledError:
+                # make room to wake up the consumer
+                if queue.full():
+                    queue.get_nowait()
+                    self.rtm_stats.dropped += 1
+                queue.put_nowait(None)
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+            await queue.put(None)
+
+        reader = self.track(self.tasks, read())
+        try:
+            while True:
+                event = await queue.get()
+                self.rtm_stats.queued = queue.qsize()
+                if event is None:
+                    break
                 yield event
+        finally:
+            reader.cancel()
+
+        if errors:
+            raise errors[0]
+
+    async def enqueue(
+        self, queue: asyncio.Queue, event: Event, overflow: str, drop: FrozenSet[str]
+    ) -> None:
+        """Add an event to an rtm buffer, applying the overflow policy when full."""
+        stats = self.rtm_stats
+        if queue.full():
+            if event.type in drop:
+                stats.dropped += 1
+                return
+            if overflow == "drop_oldest":
+                queue.get_nowait()
+                stats.dropped += 1
+
+        await queue.put(event)
+        stats.queued = queue.qsize()
+        stats.max_queued = max(stats.max_queued, stats.queued)
+
+    async def stream(
+        self,
+        *,
+        reconnect: bool = False,
+        update: bool = False,
+        types: Iterable[str] = None,
+    ) -> AsyncIterator[Event]:
+        """Read events from the websocket, as documented for rtm()."""
+        wanted = None if types is None else frozenset(types)
+        failures = 0
+        disconnected: Optional[float] = None
+
+        while not self.closed:
+            try:
+                try:
+                    url = await self.connect()
+                except asyncio.CancelledError:
+                    # close() cancels API calls that outlast its timeout,
+                    # which ends the stream just like closing the websocket
+                    if self.closed:
+                        return
+                    raise
+                async with self.session.ws_connect(url, **self.options) as ws:
+                    self.websockets.add(ws)
+                    try:
+                        self.connected(disconnected)
+                        disconnected = None
+                        failures = 0
+                        errors = self.rtm_stats.errors
+                        async for event in self.receive(ws, wanted, update):
+                            yield event
+                        if self.rtm_stats.errors > errors:
+                            failures += 1
+                    finally:
+                        self.websockets.discard(ws)
+
+            except (ClientError, asyncio.TimeoutError, SlackError) as e:
+                if self.closed:
+                    return
+                # API errors like invalid_auth won't fix themselves
+                if not reconnect or (isinstance(e, SlackError) and e.context):
+                    raise
+                failures += 1
+                log.warning(f"rtm connection failed: {e!r}")
+
+            if not reconnect or self.closed:
+                return
+            if disconnected is None:
+                disconnected = time.monotonic()
+            await self.wait_reconnect(failures)
+
+    def connected(self, disconnected: Optional[float]) -> None:
+        """Count a new RTM session, and how long it took to reconnect."""
+        self.rtm_stats.connects += 1
+        if disconnected is not None:
+            latency = time.monotonic() - disconnected
+            self.rtm_stats.reconnects += 1
+            self.rtm_stats.last_reconnect = latency
+            self.rtm_stats.reconnect_time += latency
+
+    async def receive(
+        self,
+        ws: aiohttp.ClientWebSocketResponse,
+        wanted: Optional[FrozenSet[str]],
+        update: bool,
+    ) -> AsyncIterator[Event]:
+        """Yield wanted events from one RTM session, until it ends or fails."""
+        async for msg in ws:
+            if msg.type == WSMsgType.ERROR:
+                self.rtm_stats.errors += 1
+                log.warning(f"rtm websocket error: {ws.exception()}")
+                return
+
+            data = self.loads(msg.data)
+            kind = data.get("type", "")
+
+            if kind == "goodbye":
+                return
+
+            if wanted is not None and kind not in wanted:
+                if update and kind in self.updaters:
+                    self.update(LazyEvent(data))
+                continue
+
+            event = LazyEvent(data)
+            if update:
+                self.update(event)
+
+            yield event
+
+    async def wait_reconnect(self, failures: int) -> None:
+        """Back off before reconnecting after failures, unless closed meanwhile."""
+        if failures:
+            delay = backoff(failures - 1)
+            log.debug(f"reconnecting to rtm in {delay:.1f}s")
+            await self.pause(delay)
+
+    def on(
+        self, type: str, subtype: str = None, **kwargs: Any
+    ) -> Callable[[Handler], Handler]:
+        """
+        Decorator registering a coroutine to handle RTM events in run().
+
+        Takes the same options as Dispatcher.on(): concurrency, backlog,
+        ordered, for running events from the same channel in order, and
+        overflow, for what to do when the backlog is full.
+        """
+        return self.dispatcher.on(type, subtype, **kwargs)
+
+    async def run(self, **kwargs: Any) -> None:
+        """
+        Stream RTM events to the registered handlers until the stream ends.
+
+        Takes the same arguments as rtm(); by default, only event types with
+        registered handlers are built.
+        """
+        kwargs.setdefault("types", self.dispatcher.types())
+        try:
+            async for event in self.rtm(**kwargs):
+                await self.dispatcher.dispatch(event)
+        finally:
+            await self.dispatcher.stop()
+
+    def update(self, event: Event) -> None:
+        """
+        Apply a user, channel, or group change event to the caches.
+
+        Events that can't be applied, eg, with an unexpected shape, are logged
+        and skipped rather than ending the rtm() stream they came from.
+        """
+        updater = self.updaters.get(event.type)
+        if updater is None:
+            return
+        try:
+            updater(event)
+        except Exception:  # pylint: disable=broad-except
+            log.exception(f"failed to apply {event.type} event")
+
+    def update_user(self, event: Event) -> None:
+        user = self.users.type.build(event["user"])
+        self.users[user.id] = user
+
+    def update_channel(self, event: Event) -> None:
+        cache = self.groups if event.type.startswith("group_") else self.channels
+        data = event["channel"]
+        existing = cache.get(data["id"])
+        if existing is not None and event.type.endswith("_rename"):
+            cache[data["id"]] = evolve(existing, name=data["name"])
+        else:
+            cache[data["id"]] = cache.type.build(data)
+            if "members" in data:
+                self.channel_members.set(data["id"], data["members"])
+
+    def archive_channel(self, event: Event) -> None:
+        cache = self.groups if event.type.startswith("group_") else self.channels
+        existing = cache.get(event["channel"])
+        if existing is not None:
+            archived = event.type.endswith("_archive")
+            cache[existing.id] = evolve(existing, is_archived=archived)
+
+    def delete_channel(self, event: Event) -> None:
+        cache = self.groups if event.type.startswith("group_") else self.channels
+        if event["channel"] in cache.cache:
+            del cache[event["channel"]]
+        self.channel_members.remove(event["channel"])
+
+    def leave_channel(self, event: Event) -> None:
+        # member events stop once we've left, so the member list goes stale
+        existing = self.channels.get(event["channel"])
+        if existing is not None:
+            self.channels[existing.id] = evolve(existing, is_member=False)
+        self.channel_members.remove(event["channel"])
+
+    def add_member(self, event: Event) -> None:
+        # only channels with a complete member list are indexed; a join alone
+        # would otherwise look like the whole membership
+        if event["channel"] in self.channel_members:
+            self.channel_members.add(event["channel"], event["user"])
+
+    def remove_member(self, event: Event) -> None:
+        if event["channel"] in self.channel_members:
+            self.channel_members.discard(event["channel"], event["user"])
+
+    def index_members(self, values: Iterable[Any]) -> None:
+        """Index the members of channels or groups, from their member lists."""
+        for value in values:
+            if value.members:
+                self.channel_members.set(value.id, value.members)
+
+    def dump_channel(self, value: Any) -> Dict[str, Any]:
+        """
+        Channel or group as a dict, with members from the index.
+
+        Channels that aren't indexed are dumped without members, rather than
+        with a member list that may be out of date.
+        """
+        data = asdict(value)
+        data["members"] = sorted(self.channel_members.members(value.id))
+        return data
+
+    def update_usergroup(self, event: Event) -> None:
+        usergroup = self.usergroups.type.build(event["subteam"])
+        if usergroup.date_delete:
+            if usergroup.id in self.usergroups.cache:
+                del self.usergroups[usergroup.id]
+            self.usergroup_members.remove(usergroup.id)
+            return
+
+        existing = self.usergroups.cache.get(usergroup.id)
+        if "users" in event["subteam"]:
+            self.usergroup_members.set(usergroup.id, usergroup.users)
+        elif existing is not None:
+            # updates without a member list keep the members we already know
+            usergroup = evolve(usergroup, users=existing.users)
+        self.usergroups[usergroup.id] = usergroup
+
+    def update_usergroup_members(self, event: Event) -> None:
+        key = event["subteam_id"]
+        # as with channels, changes alone would look like the whole membership
+        if key not in self.usergroup_members:
+            return
+        for user in event["added_users"] if "added_users" in event else ():
+            self.usergroup_members.add(key, user)
+        for user in event["removed_users"] if "removed_users" in event else ():
+            self.usergroup_members.discard(key, user)
+
+        existing = self.usergroups.cache.get(key)
+        if existing is not None:
+            members = sorted(self.usergroup_members.members(key))
+            self.usergroups[key] = evolve(
+                existing, users=members, user_count=str(len(members))
+            )
+
+    async def fetch_usergroups(self, *, concurrency: int = 10) -> None:
+        """
+        Fill the user group cache and membership index in bulk.
+
+        Groups are listed with their members in one call; the members of any
+        group listed without them are fetched concurrently.
+        """
+        response = await self.api("usergroups.list", include_users="true")
+        missing: List[str] = []
+        for item in response["usergroups"]:
+            usergroup = self.usergroups.type.build(item)
+            self.usergroups[usergroup.id] = usergroup
+            if "users" in item:
+                self.usergroup_members.set(usergroup.id, usergroup.users)
+            else:
+                missing.append(usergroup.id)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def members(key: str) -> None:
+            async with semaphore:
+                response = await self.api("usergroups.users.list", usergroup=key)
+            users = list(response["users"])
+            self.usergroup_members.set(key, users)
+            self.usergroups[key] = evolve(self.usergroups.cache[key], users=users)
+
+        await asyncio.gather(*(members(key) for key in missing))
+        log.debug(f"received {len(self.usergroups)} user groups")
+
+    async def prefetch(self, text: str) -> None:
+        """Fetch any users mentioned in text that aren't cached, for decode()."""
+        await self.users.prefetch(
+            match.group(2)
+            for match in self.decode_re.finditer(text)
+            if match.group(1) == "@"
+        )
 
     def decode(self, text: str, prefix: str = "@") -> str:
-        """Decode <@id> and <!alias> into @username."""
+        """
+        Decode message markup into plain text, in a single pass.
+
+        User mentions <@id> become @username, channel links <#id> become
+        #channel, specials like <!here> and <!subteam^id> become @here and
+        @handle, links <url|label> become their label or url, and escaped
+        characters are unescaped.  Unknown ids fall back to their label.
+        """
+        if "<" in text:
+            callback = self.decoders.get(prefix)
+            if callback is None:
+                callback = self.decoders[prefix] = self.decoder(prefix)
+            text = self.decode_re.sub(callback, text)
+
+        if "&" in text:
+            # unescape last, so escaped brackets can't be mistaken for markup
+            text = text.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
+        return text
+
+    def decoder(self, prefix: str) -> Callable[[Match], str]:
+        """Build the decode() callback for markup matches, using prefix for @."""
+        # plain dict lookups; decoding shouldn't count as cache hits or misses
+        users = self.users.cache
+        channels = self.channels.cache
+        groups = self.groups.cache
 
         def callback(match: Match) -> str:
-            m = match.groupdict()
-            if m["userid"]:
-                user = self.users.get(m["userid"], None)
-                if user is None:
-                    username = m["userid"]
-                else:
-                    username = user.name
-            elif m["alias"]:
-                username = m["alias"]
-            return f"{prefix}{username}"
-
-        return self.decode_re.sub(callback, text)
+            sigil, target, label = match.groups()
+            if sigil == "@":
+                user = users.get(target)
+                return f"{prefix}{user.name if user is not None else label or target}"
+            if sigil == "#":
+                channel = channels.get(target) or groups.get(target)
+                return f"#{channel.name if channel is not None else label or target}"
+            if sigil == "!":
+                return self.decode_special(target, label or "", prefix)
+            return label or target
+
+        return callback
+
+    def decode_special(self, target: str, label: str, prefix: str) -> str:
+        name, _, arg = target.partition("^")
+        if name == "subteam":
+            usergroup = self.usergroups.cache.get(arg)
+            if usergroup is not None:
+                return f"{prefix}{usergroup.handle}"
+            return f"{prefix}{label.lstrip('@') or arg}"
+        if name == "date":
+            return label or arg
+        if name in SPECIALS or not label:
+            return f"{prefix}{name}"
+        return label
 
     def encode(self, text: str) -> str:
-        """Encode @username into <@id> or <!alias>."""
+        """Encode @username into <@id>, and @handle or @alias into <!...>."""
 
         def callback(match: Match) -> str:
             name = match.group("name").lower()
-            if name in ["here", "everyone", "channel"]:
+            if name in SPECIALS:
                 return f"<!{name}>"
-            else:
-                for user in self.users.values():
-                    if user.name == name:
-                        return f"<@{user.id}>"
+            user = self.users.find(name)
+            if user is not None:
+                return f"<@{user.id}>"
+            usergroup = self.usergroups.find(name)
+            if usergroup is not None:
+                return f"<!subteam^{usergroup.id}|@{usergroup.handle}>"
             return match.group(0)
 
         return self.encode_re.sub(callback, text)
@@ -0,0 +1,216 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Dispatch RTM events to handlers registered by event type and subtype.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Set
+
+from attr import dataclass
+
+from .types import Event
+
+Handler = Callable[[Event], Awaitable[Any]]
+
+# what to do with events for a handler whose backlog is full
+OVERFLOW = ("drop", "block")
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class HandlerStats:
+    calls: int = 0
+    errors: int = 0
+    dropped: int = 0
+    queued: int = 0
+    max_queued: int = 0
+    wait_time: float = 0.0
+    run_time: float = 0.0
+    max_run_time: float = 0.0
+
+
+def channel_of(event: Event) -> str:
+    """Channel ID an event belongs to, or an empty string."""
+    if "channel" not in event:
+        return ""
+    channel = event["channel"]
+    if isinstance(channel, Mapping):
+        return channel.get("id", "")
+    return channel or ""
+
+
+class Route:
+    """
+    A handler with its own worker tasks and bounded backlog.
+
+    Up to concurrency events are handled at once.  When ordered, events for
+    the same channel always go to the same worker, and run in the order they
+    were received.  Events arriving while the backlog is full are dropped and
+    counted, so one slow handler can't hold up the others, unless overflow
+    is "block".
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        type: str,
+        subtype: Optional[str],
+        *,
+        concurrency: int = 1,
+        backlog: int = 100,
+        ordered: bool = False,
+        overflow: str = "drop",
+    ) -> None:
+        if overflow not in OVERFLOW:
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        self.handler = handler
+        self.type = type
+        self.subtype = subtype
+        self.concurrency = concurrency
+        self.backlog = backlog
+        self.ordered = ordered
+        self.overflow = overflow
+        self.queues: List[asyncio.Queue] = []
+        self.workers: List[asyncio.Future] = []
+        self.stats = HandlerStats()
+
+    @property
+    def name(self) -> str:
+        name = getattr(self.handler, "__qualname__", repr(self.handler))
+        if self.subtype:
+            return f"{self.type}/{self.subtype}:{name}"
+        return f"{self.type}:{name}"
+
+    def matches(self, event: Event) -> bool:
+        if self.subtype is None:
+            return True
+        return "subtype" in event and event["subtype"] == self.subtype
+
+    def start(self) -> None:
+        if self.workers:
+            return
+
+        if self.ordered:
+            size = max(1, self.backlog // self.concurrency)
+            self.queues = [asyncio.Queue(size) for _ in range(self.concurrency)]
+            queues = self.queues
+        else:
+            self.queues = [asyncio.Queue(self.backlog)]
+            queues = self.queues * self.concurrency
+        self.workers = [asyncio.ensure_future(self.work(queue)) for queue in queues]
+
+    async def put(self, event: Event) -> None:
+        """Queue an event, applying the overflow policy if the backlog is full."""
+        self.start()
+        if self.ordered:
+            queue = self.queues[hash(channel_of(event)) % len(self.queues)]
+        else:
+            queue = self.queues[0]
+
+        if self.overflow == "block":
+            await queue.put((time.monotonic(), event))
+        else:
+            try:
+                queue.put_nowait((time.monotonic(), event))
+            except asyncio.QueueFull:
+                self.stats.dropped += 1
+                return
+        self.stats.queued = sum(q.qsize() for q in self.queues)
+        self.stats.max_queued = max(self.stats.max_queued, self.stats.queued)
+
+    async def work(self, queue: asyncio.Queue) -> None:
+        while True:
+            queued, event = await queue.get()
+            start = time.monotonic()
+            try:
+                await self.handler(event)
+            except Exception:  # pylint: disable=broad-except
+                self.stats.errors += 1
+                log.exception(f"{self.name} failed handling {event.type} event")
+            finally:
+                elapsed = time.monotonic() - start
+                self.stats.calls += 1
+                self.stats.queued = sum(q.qsize() for q in self.queues)
+                self.stats.wait_time += start - queued
+                self.stats.run_time += elapsed
+                self.stats.max_run_time = max(self.stats.max_run_time, elapsed)
+                queue.task_done()
+
+    async def stop(self, drain: bool = True) -> None:
+        """Stop the workers, after handling any queued events if drain is set."""
+        if drain:
+            await asyncio.gather(*(queue.join() for queue in self.queues))
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queues = []
+
+
+class Dispatcher:
+    """
+    Route events to the handlers registered for their type and subtype.
+
+    Handlers registered for "*" receive every event.
+    """
+
+    def __init__(self) -> None:
+        self.routes: Dict[str, List[Route]] = {}
+
+    def on(
+        self,
+        type: str,
+        subtype: str = None,
+        *,
+        concurrency: int = 1,
+        backlog: int = 100,
+        ordered: bool = False,
+        overflow: str = "drop",
+    ) -> Callable[[Handler], Handler]:
+        """Decorator registering a coroutine to handle events of a given type."""
+
+        def wrapper(handler: Handler) -> Handler:
+            route = Route(
+                handler,
+                type,
+                subtype,
+                concurrency=concurrency,
+                backlog=backlog,
+                ordered=ordered,
+                overflow=overflow,
+            )
+            self.routes.setdefault(type, []).append(route)
+            return handler
+
+        return wrapper
+
+    def types(self) -> Optional[Set[str]]:
+        """Event types with handlers, or None if any handler wants everything."""
+        if "*" in self.routes:
+            return None
+        return set(self.routes)
+
+    @property
+    def stats(self) -> Dict[str, HandlerStats]:
+        return {
+            route.name: route.stats
+            for routes in self.routes.values()
+            for route in routes
+        }
+
+    async def dispatch(self, event: Event) -> None:
+        """Queue an event for each matching handler."""
+        for key in (event.type, "*"):
+            for route in self.routes.get(key, ()):
+                if route.matches(event):
+                    await route.put(event)
+
+    async def stop(self, drain: bool = True) -> None:
+        await asyncio.gather(
+            *(route.stop(drain) for routes in self.routes.values() for route in routes)
+        )
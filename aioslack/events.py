@@ -0,0 +1,168 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Receive Events API deliveries over HTTP.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Optional, Tuple
+
+from aiohttp import web
+from attr import dataclass
+
+from .types import EventWrapper, LazyEvent
+
+# requests signed longer ago than this are rejected as replays
+MAX_AGE = 300
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ReceiverStats:
+    received: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    retries: int = 0
+    dropped: int = 0
+    processed: int = 0
+    wait_time: float = 0.0
+    max_wait: float = 0.0
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """Compute the v0 signature Slack sends for a request body."""
+    base = b"v0:" + timestamp.encode() + b":" + body
+    digest = hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+    return f"v0={digest}"
+
+
+def verify(
+    secret: str, timestamp: str, body: bytes, signature: str, now: float = None
+) -> bool:
+    """Check a request's signature, and that it was signed recently."""
+    try:
+        age = abs((time.time() if now is None else now) - int(timestamp))
+    except ValueError:
+        return False
+    if age > MAX_AGE:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), signature)
+
+
+class Receiver:
+    """
+    Events API endpoint that verifies, acknowledges, and queues deliveries.
+
+    Each request is checked against the app's signing secret, and
+    acknowledged as soon as its event is queued, well inside Slack's three
+    second window; events() then yields the queued EventWrapper objects,
+    whose event is a LazyEvent.  Retried deliveries of an event_id that was
+    already queued are acknowledged and skipped.  When backlog events are
+    already waiting, requests are answered with a 503 so that Slack retries
+    them later.
+
+        receiver = Receiver(secret)
+        await receiver.start(port=3000)
+        async for wrapper in receiver.events():
+            await slack.dispatcher.dispatch(wrapper.event)
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        *,
+        path: str = "/slack/events",
+        backlog: int = 1000,
+        dedupe: int = 10000,
+        loads: Callable[[Any], Any] = json.loads,
+    ) -> None:
+        self.secret = secret
+        self.path = path
+        self.dedupe = dedupe
+        self.loads = loads
+        self.queue: "asyncio.Queue[Tuple[float, EventWrapper]]" = asyncio.Queue(backlog)
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+        self.runner: Optional[web.AppRunner] = None
+        self.stats = ReceiverStats()
+
+    def app(self) -> web.Application:
+        """Application serving the events endpoint, for mounting elsewhere."""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def start(self, host: str = "0.0.0.0", port: int = 3000) -> None:
+        """Serve the events endpoint on the given address."""
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        log.info(f"receiving events on {host}:{port}{self.path}")
+
+    async def stop(self) -> None:
+        """Stop serving requests."""
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        received = time.monotonic()
+        self.stats.received += 1
+        body = await request.read()
+        timestamp = request.headers.get("X-Slack-Request-Timestamp", "")
+        signature = request.headers.get("X-Slack-Signature", "")
+        if not verify(self.secret, timestamp, body, signature):
+            self.stats.rejected += 1
+            return web.Response(status=401)
+
+        try:
+            data = self.loads(body)
+        except ValueError:
+            self.stats.rejected += 1
+            return web.Response(status=400)
+
+        if data.get("type") == "url_verification":
+            return web.json_response({"challenge": data.get("challenge", "")})
+
+        if "X-Slack-Retry-Num" in request.headers:
+            self.stats.retries += 1
+
+        event_id = data.get("event_id", "")
+        if event_id and event_id in self.seen:
+            self.stats.duplicates += 1
+            return web.Response()
+
+        wrapper = EventWrapper.build(
+            {**data, "event": LazyEvent(data.get("event") or {})}
+        )
+        try:
+            self.queue.put_nowait((received, wrapper))
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            return web.Response(status=503)
+
+        if event_id:
+            self.seen[event_id] = None
+            while len(self.seen) > self.dedupe:
+                self.seen.popitem(last=False)
+        self.stats.accepted += 1
+        return web.Response()
+
+    async def events(self) -> AsyncIterator[EventWrapper]:
+        """Yield received events in order, as they're queued."""
+        while True:
+            received, wrapper = await self.queue.get()
+            waited = time.monotonic() - received
+            self.stats.processed += 1
+            self.stats.wait_time += waited
+            self.stats.max_wait = max(self.stats.max_wait, waited)
+            yield wrapper
@@ -0,0 +1,94 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Many workspace clients sharing one HTTP connection pool.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Iterator
+
+import aiohttp
+
+from .core import Slack
+from .ratelimit import LimiterStats
+
+log = logging.getLogger(__name__)
+
+
+class SlackPool:
+    """
+    Slack clients for many tokens, multiplexed over a single HTTP session.
+
+    All clients share one connector, so connections to slack.com, TLS
+    sessions, and DNS lookups are reused across workspaces; each client still
+    sends its own token with every request and keeps its own rate limits.
+    The connector holds at most limit connections, kept alive for
+    keepalive_timeout seconds when idle.  Other options are passed to each
+    Slack client.
+    """
+
+    def __init__(
+        self,
+        *,
+        limit: int = 100,
+        keepalive_timeout: float = 30.0,
+        ttl_dns_cache: int = 300,
+        **options: Any,
+    ) -> None:
+        self.options = options
+        self.clients: Dict[str, Slack] = {}
+        self.connector = aiohttp.TCPConnector(
+            limit=limit,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=ttl_dns_cache,
+        )
+        self.session = aiohttp.ClientSession(connector=self.connector)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.clients
+
+    def __getitem__(self, token: str) -> Slack:
+        return self.clients[token]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.clients)
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    async def __aenter__(self) -> "SlackPool":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    @property
+    def stats(self) -> Dict[str, LimiterStats]:
+        """Rate limiter stats for each token."""
+        return {token: slack.limiter.stats for token, slack in self.clients.items()}
+
+    def add(self, token: str, **options: Any) -> Slack:
+        """Get the client for a token, creating it on the shared session."""
+        if token not in self.clients:
+            options = {**self.options, **options}
+            self.clients[token] = Slack(token, session=self.session, **options)
+        return self.clients[token]
+
+    async def remove(self, token: str, timeout: float = 5.0) -> None:
+        """Close the client for a token and drop it from the pool."""
+        slack = self.clients.pop(token)
+        await slack.close(timeout)
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Close every client, then the shared session."""
+        clients = list(self.clients.values())
+        self.clients.clear()
+        results = await asyncio.gather(
+            *(slack.close(timeout) for slack in clients), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                log.warning(f"failed to close client: {result!r}")
+        await self.session.close()
@@ -0,0 +1,164 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Client-side rate limiting for the Slack Web API.
+
+Based on the rate limit tiers documented at https://api.slack.com/docs/rate-limits
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Mapping, Optional, Union
+
+from attr import dataclass
+
+log = logging.getLogger(__name__)
+
+# numbered tiers, or "special" for methods with their own documented limits
+Tier = Union[int, str]
+
+# requests per minute allowed for each tier; chat.postMessage is limited to
+# about one per second per channel (see Sender), so the workspace-wide cap
+# for the special tier is only a backstop
+TIERS: Dict[Tier, int] = {1: 1, 2: 20, 3: 50, 4: 100, "special": 600}
+
+# requests allowed at once before the per-minute rate applies, for tiers
+# whose limit is too low to absorb a few quick reconnects
+BURSTS: Dict[Tier, int] = {1: 5}
+
+DEFAULT_TIER = 3
+
+METHOD_TIERS: Dict[str, Tier] = {
+    "rtm.start": 1,
+    "rtm.connect": 1,
+    "channels.list": 2,
+    "conversations.list": 2,
+    "groups.list": 2,
+    "usergroups.list": 2,
+    "usergroups.users.list": 2,
+    "users.list": 2,
+    "channels.info": 3,
+    "conversations.history": 3,
+    "conversations.info": 3,
+    "conversations.replies": 3,
+    "groups.info": 3,
+    "team.info": 3,
+    "auth.test": 4,
+    "conversations.members": 4,
+    "users.info": 4,
+    "chat.postMessage": "special",
+}
+
+# method name prefixes, after the last dot, that only read state
+IDEMPOTENT = ("get", "history", "info", "list", "lookup", "members", "replies", "test")
+
+
+def idempotent(method: str) -> bool:
+    """Whether the given API method is safe to retry."""
+    return method.rsplit(".", 1)[-1].startswith(IDEMPOTENT)
+
+
+@dataclass
+class LimiterStats:
+    queued: int = 0
+    requests: int = 0
+    delayed: int = 0
+    wait_time: float = 0.0
+    max_wait: float = 0.0
+    throttled: int = 0
+    retries: int = 0
+
+
+class Bucket:
+    """
+    Token bucket refilling at a steady rate, with room for bursts up to capacity.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock: Optional[asyncio.Lock] = None
+
+    def delay(self) -> float:
+        """Seconds until a token is available, refilling the bucket first."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given time, eg, after a 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class Limiter:
+    """
+    Schedule API calls so that each method tier stays within its rate limit.
+
+    Callers queue in order for a token from their tier's bucket; Retry-After
+    responses pause the whole tier.  Each bucket holds a minute's worth of
+    requests, or the tier's burst allowance if that is larger.
+    """
+
+    def __init__(
+        self,
+        tiers: Mapping[Tier, int] = None,
+        methods: Mapping[str, Tier] = None,
+        bursts: Mapping[Tier, int] = None,
+    ) -> None:
+        tiers = TIERS if tiers is None else tiers
+        bursts = BURSTS if bursts is None else bursts
+        self.methods = METHOD_TIERS if methods is None else methods
+        self.buckets: Dict[Tier, Bucket] = {
+            tier: Bucket(limit / 60, max(limit, bursts.get(tier, 0)))
+            for tier, limit in tiers.items()
+        }
+        self.stats = LimiterStats()
+
+    def bucket(self, method: str) -> Bucket:
+        return self.buckets[self.methods.get(method, DEFAULT_TIER)]
+
+    async def acquire(self, method: str) -> None:
+        """Wait until the given method may be called."""
+        bucket = self.bucket(method)
+        if bucket.lock is None:
+            bucket.lock = asyncio.Lock()
+
+        start = time.monotonic()
+        self.stats.queued += 1
+        try:
+            async with bucket.lock:
+                delay = bucket.delay()
+                while delay > 0:
+                    await asyncio.sleep(delay)
+                    delay = bucket.delay()
+                bucket.take()
+        finally:
+            self.stats.queued -= 1
+
+        waited = time.monotonic() - start
+        self.stats.requests += 1
+        if waited > 0.001:
+            self.stats.delayed += 1
+            self.stats.wait_time += waited
+            self.stats.max_wait = max(self.stats.max_wait, waited)
+
+    def throttle(self, method: str, retry_after: float) -> None:
+        """Record a rate limited response, pausing the method's tier."""
+        log.warning(f"{method} rate limited, retrying after {retry_after}s")
+        self.stats.throttled += 1
+        self.bucket(method).pause(retry_after)
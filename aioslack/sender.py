@@ -0,0 +1,180 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Queue outbound messages, in order per channel.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from attr import dataclass
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class SenderStats:
+    queued: int = 0
+    max_queued: int = 0
+    messages: int = 0
+    posts: int = 0
+    coalesced: int = 0
+    errors: int = 0
+    latency: float = 0.0
+    max_latency: float = 0.0
+
+
+@dataclass
+class Outgoing:
+    text: str
+    options: Dict[str, Any]
+    coalesce: bool
+    future: asyncio.Future
+    queued: float
+
+
+class Sender:
+    """
+    Post messages through chat.postMessage, one channel at a time.
+
+    Each channel has its own queue and worker, so messages to a channel are
+    posted in order, at most one per interval seconds, while different
+    channels are posted to in parallel.  Consecutive queued messages to the
+    same channel with the same options are joined into a single post, up to
+    maxlen characters, unless sent with coalesce=False.  Text is passed
+    through encode, if given, just before posting.
+    """
+
+    def __init__(
+        self,
+        api: Callable[..., Awaitable[Any]],
+        *,
+        encode: Callable[[str], str] = None,
+        interval: float = 1.0,
+        separator: str = "\n",
+        maxlen: int = 4000,
+    ) -> None:
+        self.api = api
+        self.encode = encode
+        self.interval = interval
+        self.separator = separator
+        self.maxlen = maxlen
+        self.queues: Dict[str, Deque[Outgoing]] = {}
+        self.workers: Dict[str, asyncio.Future] = {}
+        self.posted: Dict[str, float] = {}
+        self.stats = SenderStats()
+
+    @property
+    def backlog(self) -> Dict[str, int]:
+        """Number of queued messages for each channel."""
+        return {channel: len(queue) for channel, queue in self.queues.items()}
+
+    def send(
+        self, channel: str, text: str, *, coalesce: bool = True, **options: Any
+    ) -> "asyncio.Future[Any]":
+        """Queue a message, returning a future for the chat.postMessage response."""
+        future = asyncio.get_event_loop().create_future()
+        queue = self.queues.setdefault(channel, deque())
+        queue.append(Outgoing(text, options, coalesce, future, time.monotonic()))
+        self.stats.queued += 1
+        self.stats.max_queued = max(self.stats.max_queued, self.stats.queued)
+
+        if channel not in self.workers:
+            self.workers[channel] = asyncio.ensure_future(self.work(channel))
+        return future
+
+    def batch(self, queue: Deque[Outgoing]) -> List[Outgoing]:
+        """Take the next message from a queue, and any it can be joined with."""
+        first = queue.popleft()
+        batch = [first]
+        if not first.coalesce:
+            return batch
+
+        length = len(first.text)
+        while queue:
+            message = queue[0]
+            length += len(self.separator) + len(message.text)
+            if (
+                not message.coalesce
+                or message.options != first.options
+                or length > self.maxlen
+            ):
+                break
+            batch.append(queue.popleft())
+        return batch
+
+    async def post(self, channel: str, batch: List[Outgoing]) -> None:
+        text = self.separator.join(message.text for message in batch)
+        if self.encode is not None:
+            text = self.encode(text)
+
+        try:
+            response = await self.api(
+                "chat.postMessage", channel=channel, text=text, **batch[0].options
+            )
+        except asyncio.CancelledError:
+            for message in batch:
+                message.future.cancel()
+            raise
+        except Exception as e:  # pylint: disable=broad-except
+            self.stats.errors += 1
+            log.warning(f"failed to post to {channel}: {e!r}")
+            for message in batch:
+                if not message.future.done():
+                    message.future.set_exception(e)
+            return
+
+        now = time.monotonic()
+        for message in batch:
+            latency = now - message.queued
+            self.stats.latency += latency
+            self.stats.max_latency = max(self.stats.max_latency, latency)
+            if not message.future.done():
+                message.future.set_result(response)
+
+    async def work(self, channel: str) -> None:
+        queue = self.queues[channel]
+        try:
+            while queue:
+                # messages queued while waiting get the chance to be joined
+                delay = self.posted.get(channel, 0.0) + self.interval
+                delay -= time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                batch = self.batch(queue)
+                self.stats.queued -= len(batch)
+                self.stats.messages += len(batch)
+                self.stats.posts += 1
+                self.stats.coalesced += len(batch) - 1
+
+                self.posted[channel] = time.monotonic()
+                await self.post(channel, batch)
+        finally:
+            del self.workers[channel]
+            if not queue:
+                del self.queues[channel]
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait up to timeout seconds for queued messages to be posted.
+
+        Workers still running after that are cancelled, and their unsent
+        messages fail with CancelledError.
+        """
+        workers = list(self.workers.values())
+        if workers:
+            _, pending = await asyncio.wait(workers, timeout=timeout)
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        for queue in self.queues.values():
+            for message in queue:
+                message.future.cancel()
+            self.stats.queued -= len(queue)
+        self.queues.clear()
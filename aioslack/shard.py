@@ -0,0 +1,304 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Ingest RTM events for many workspaces across a pool of worker processes.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from attr import dataclass
+
+from .codec import get_loads
+from .core import backoff
+from .pool import SlackPool
+from .types import Event, LazyEvent
+
+# called in the worker process with each token and event; must be picklable
+EventHandler = Callable[[str, Event], Any]
+
+# workers that ran at least this many seconds before exiting restart promptly
+HEALTHY = 60.0
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class WorkerStats:
+    pid: int = 0
+    tokens: int = 0
+    events: int = 0
+    restarts: int = 0
+    failures: int = 0
+    dropped: int = 0
+    started: float = 0.0
+    rate: float = 0.0
+
+
+def shard(tokens: Sequence[str], count: int) -> List[List[str]]:
+    """Split tokens round-robin into at most count non-empty shards."""
+    shards: List[List[str]] = [[] for _ in range(min(count, len(tokens)))]
+    for idx, token in enumerate(tokens):
+        shards[idx % len(shards)].append(token)
+    return shards
+
+
+def serialize(event: LazyEvent) -> str:
+    """Compact JSON form of an event, for sending to another process."""
+    return json.dumps(event.to_dict(), separators=(",", ":"))
+
+
+def mask(token: str) -> str:
+    """Enough of a token to tell it apart in logs."""
+    return f"{token[:9]}..."
+
+
+async def ingest(
+    tokens: Sequence[str],
+    events: Any,
+    counter: Any,
+    dropped: Any,
+    handler: Optional[EventHandler],
+    options: Mapping[str, Any],
+    rtm: Mapping[str, Any],
+) -> None:
+    """
+    Stream RTM events for each token over one shared pool, until all end.
+
+    Events are passed to handler when given, or otherwise put serialized on
+    the events queue; while the queue is full, events are dropped and
+    counted rather than stalling every websocket in the worker.  A token
+    whose stream fails, eg, with invalid_auth, is logged and dropped without
+    affecting the others.
+    """
+
+    async def read(pool: SlackPool, token: str) -> None:
+        try:
+            async for event in pool.add(token).rtm(**rtm):
+                counter.value += 1
+                if handler is None:
+                    try:
+                        events.put_nowait((token, serialize(event)))
+                    except queue.Full:
+                        dropped.value += 1
+                    continue
+                try:
+                    result = handler(token, event)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception:  # pylint: disable=broad-except
+                    log.exception(f"handler failed on {event.type} event")
+        except Exception:  # pylint: disable=broad-except
+            log.exception(f"dropping token {mask(token)}")
+            await pool.remove(token)
+
+    async with SlackPool(**options) as pool:
+        await asyncio.gather(*(read(pool, token) for token in tokens))
+
+
+def work(
+    tokens: Sequence[str],
+    events: Any,
+    counter: Any,
+    dropped: Any,
+    handler: Optional[EventHandler],
+    options: Mapping[str, Any],
+    rtm: Mapping[str, Any],
+) -> None:
+    """Worker process entry point."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(
+            ingest(tokens, events, counter, dropped, handler, options, rtm)
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+
+
+class Supervisor:
+    """
+    Shard workspace tokens across worker processes, each streaming RTM events.
+
+    Each worker runs rtm() for its shard of tokens over a shared SlackPool,
+    created with the given options.  Events are either passed to handler in
+    the worker process, or sent to the parent in compact serialized form and
+    yielded by events() as (token, LazyEvent) pairs, dropping events while
+    maxsize are waiting.  Workers are started with the spawn method, so
+    handler must be picklable by reference, like a module-level function.
+    Workers that exit are restarted with the same shard, after a jittered
+    exponential backoff when they keep failing, and given up on after
+    max_restarts failures in a row.  Per-worker event counts, rates, drops,
+    and restarts are available from stats.
+
+        async with Supervisor(tokens, workers=4) as supervisor:
+            async for token, event in supervisor.events():
+                ...
+    """
+
+    def __init__(
+        self,
+        tokens: Sequence[str],
+        *,
+        workers: int = None,
+        handler: EventHandler = None,
+        maxsize: int = 10000,
+        interval: float = 1.0,
+        max_restarts: Optional[int] = 10,
+        rtm: Mapping[str, Any] = None,
+        **options: Any,
+    ) -> None:
+        self.shards = shard(tokens, workers or os.cpu_count() or 1)
+        self.handler = handler
+        self.interval = interval
+        self.max_restarts = max_restarts
+        self.rtm = {"reconnect": True, **(rtm or {})}
+        self.options = options
+        self.loads = get_loads(options.get("decoder", "json"))
+        # workers are restarted while events() has executor threads running,
+        # and forking a multi-threaded parent isn't safe
+        self.context = multiprocessing.get_context("spawn")
+        self.events_queue = self.context.Queue(maxsize)
+        self.counters = [self.context.Value("Q", 0, lock=False) for _ in self.shards]
+        self.dropped = [self.context.Value("Q", 0, lock=False) for _ in self.shards]
+        self.processes: List[Optional[Any]] = [None for _ in self.shards]
+        self.spawned = [0.0 for _ in self.shards]
+        self.restart_at = [0.0 for _ in self.shards]
+        self.workers = [WorkerStats(tokens=len(tokens)) for tokens in self.shards]
+        self.task: Optional[asyncio.Future] = None
+        self.running = False
+
+    async def __aenter__(self) -> "Supervisor":
+        self.start()
+        self.task = asyncio.ensure_future(self.monitor())
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.stop()
+
+    @property
+    def stats(self) -> List[WorkerStats]:
+        """Current stats for each worker, with events per second since start."""
+        now = time.monotonic()
+        for stats, counter, dropped in zip(self.workers, self.counters, self.dropped):
+            stats.events = counter.value
+            stats.dropped = dropped.value
+            elapsed = now - stats.started
+            stats.rate = stats.events / elapsed if stats.started and elapsed else 0.0
+        return self.workers
+
+    def spawn(self, index: int) -> None:
+        process = self.context.Process(
+            target=work,
+            name=f"aioslack-shard-{index}",
+            args=(
+                self.shards[index],
+                self.events_queue,
+                self.counters[index],
+                self.dropped[index],
+                self.handler,
+                self.options,
+                self.rtm,
+            ),
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+        self.spawned[index] = time.monotonic()
+        self.workers[index].pid = process.pid or 0
+
+    def start(self) -> None:
+        """Start a worker process for each shard."""
+        self.running = True
+        now = time.monotonic()
+        for index in range(len(self.shards)):
+            self.workers[index].started = now
+            self.spawn(index)
+
+    def check(self) -> None:
+        """Restart any worker processes that have exited, once their backoff ends."""
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process is None or process.is_alive():
+                continue
+
+            stats = self.workers[index]
+            if not self.restart_at[index]:
+                if now - self.spawned[index] >= HEALTHY:
+                    stats.failures = 0
+                stats.failures += 1
+                if self.max_restarts is not None and stats.failures > self.max_restarts:
+                    log.error(
+                        f"shard {index} exited with {process.exitcode} "
+                        f"{stats.failures} times in a row, giving up"
+                    )
+                    self.processes[index] = None
+                    continue
+
+                delay = backoff(stats.failures - 1)
+                self.restart_at[index] = now + delay
+                log.warning(
+                    f"shard {index} exited with {process.exitcode}, "
+                    f"restarting in {delay:.1f}s"
+                )
+
+            if now >= self.restart_at[index]:
+                self.restart_at[index] = 0.0
+                stats.restarts += 1
+                self.spawn(index)
+
+    async def monitor(self) -> None:
+        """Check on workers every interval seconds while running."""
+        while self.running:
+            self.check()
+            await asyncio.sleep(self.interval)
+
+    async def events(self) -> AsyncIterator[Tuple[str, LazyEvent]]:
+        """Yield events forwarded by workers, until stopped."""
+        loop = asyncio.get_event_loop()
+        while self.running:
+            try:
+                token, data = await loop.run_in_executor(
+                    None, self.events_queue.get, True, self.interval
+                )
+            except queue.Empty:
+                continue
+            yield token, LazyEvent(self.loads(data))
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Stop monitoring and terminate all worker processes."""
+        self.running = False
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        loop = asyncio.get_event_loop()
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for index, process in enumerate(self.processes):
+            if process is not None:
+                await loop.run_in_executor(None, process.join, timeout)
+                if process.is_alive():
+                    log.warning(f"shard {index} did not exit after {timeout}s")
+                self.processes[index] = None
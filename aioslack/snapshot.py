@@ -0,0 +1,56 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+On-disk snapshots of workspace state, for warm restarts.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from appdirs import user_cache_dir
+
+VERSION = 1
+
+log = logging.getLogger(__name__)
+
+
+def default_path(token: str) -> str:
+    """Snapshot location for a token, in the user's cache directory."""
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(user_cache_dir("aioslack"), f"{digest}.json.gz")
+
+
+def write(path: str, data: Dict[str, Any]) -> None:
+    """Write a snapshot atomically as gzipped, compact JSON."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def read(path: str, max_age: float) -> Optional[Dict[str, Any]]:
+    """Read a snapshot, or None if it is missing, unreadable, or too old."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        log.debug(f"ignoring snapshot {path}: {e!r}")
+        return None
+
+    if data.get("version") != VERSION:
+        log.debug(f"ignoring snapshot {path}: version {data.get('version')}")
+        return None
+
+    age = time.time() - data.get("saved", 0)
+    if age > max_age:
+        log.debug(f"ignoring snapshot {path}: {age:.0f}s old")
+        return None
+
+    return data
@@ -5,23 +5,128 @@
 State management of the Slack connectionself.
 """
 
-from typing import Dict, Iterator, Iterable, Mapping, Type, TypeVar, Optional
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    Iterable,
+    List,
+    Mapping,
+    Type,
+    TypeVar,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from attr import dataclass
 
 from .types import Auto
 
 VT = TypeVar("VT", bound=Auto)
 
+log = logging.getLogger(__name__)
+
+# seconds to cache responses from read-only methods
+RESPONSE_TTLS: Dict[str, float] = {
+    "auth.test": 3600,
+    "bots.info": 300,
+    "channels.info": 60,
+    "conversations.info": 60,
+    "groups.info": 60,
+    "team.info": 3600,
+    "usergroups.list": 300,
+    "users.info": 60,
+}
+
+
+def normalize(name: str) -> str:
+    """Normalize a name for case- and whitespace-insensitive lookups."""
+    return "".join(name.split()).lower()
+
+
+def user_aliases(user: Any) -> List[str]:
+    """Secondary names a user can be mentioned by."""
+    profile = user["profile"]
+    return [
+        profile["display_name"],
+        profile["display_name_normalized"],
+        user["real_name"],
+        profile["real_name_normalized"],
+    ]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+def usergroup_aliases(usergroup: Any) -> List[str]:
+    """Secondary names a user group can be mentioned by."""
+    return [usergroup["handle"]]
+
+
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
 
 class Cache:
     """
     Cache objects of the given type, with optional readthrough via URL.
+
+    Objects are indexed by key, by exact name, and by normalized name and
+    aliases; the indexes are kept current as objects are replaced or deleted.
+
+    Given an api coroutine, fetch() and prefetch() fill misses by calling the
+    url method with the key as its param argument, eg, users.info(user=key).
+
+    With maxsize, the least recently used objects are evicted once the cache
+    is full; with ttl, objects expire that many seconds after being stored.
     """
 
-    def __init__(self, _type: Type[VT], url: str = None) -> None:
-        self.cache: Dict[str, VT] = {}
+    def __init__(
+        self,
+        _type: Type[VT],
+        url: str = None,
+        *,
+        aliases: Callable[[VT], Iterable[str]] = None,
+        api: Callable[..., Awaitable[Any]] = None,
+        param: str = None,
+        concurrency: int = 10,
+        maxsize: int = None,
+        ttl: float = None,
+    ) -> None:
+        self.cache: "OrderedDict[str, VT]" = OrderedDict()
+        self.expires: Dict[str, float] = {}
         self.by_name: Dict[str, str] = {}
+        self.by_alias: Dict[str, str] = {}
+        self.owners: Dict[str, List[str]] = {}
+        self.indexed: Dict[str, List[str]] = {}
         self.type = _type
         self.url = url
+        self.aliases = aliases
+        self.api = api
+        self.field = _type.__name__.lower()
+        self.param = param or self.field
+        self.concurrency = concurrency
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
 
     def __iter__(self) -> Iterator[str]:
         return self.cache.__iter__()
@@ -30,27 +135,114 @@ class Cache:
         return self.cache.__len__()
 
     def __contains__(self, key: str) -> bool:
-        return key in self.cache or key in self.by_name
+        return self.resolve(key) is not None
 
     def __getitem__(self, key: str) -> VT:
-        if key in self.cache:
-            return self.cache[key]
-
-        if key in self.by_name:
-            return self[self.by_name[key]]
-
-        raise KeyError(f"{self.type.__name__} {key} not in cache")
-        # TODO: make API request to fill cache?
+        value = self.lookup(key)
+        if value is None:
+            raise KeyError(f"{self.type.__name__} {key} not in cache")
+        return value
 
     def __setitem__(self, key: str, value: VT) -> None:
         if not isinstance(value, self.type):
             raise ValueError(f"{key} is not {self.type.__name__}")
+        self.add(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self.cache:
+            raise KeyError(f"{self.type.__name__} {key} not in cache")
+        self.remove(key)
+
+    def resolve(self, key: str) -> Optional[str]:
+        """Find the cache key for a key or name, expiring stale entries."""
+        if key not in self.cache:
+            key = self.by_name.get(key, key)
+            if key not in self.cache:
+                return None
+
+        if self.ttl is not None and self.expires[key] <= time.monotonic():
+            self.remove(key)
+            self.stats.expirations += 1
+            return None
+
+        return key
+
+    def lookup(self, key: str) -> Optional[VT]:
+        """Get a value by key or name, counting hits and misses."""
+        key = self.resolve(key)
+        if key is None:
+            self.stats.misses += 1
+            return None
+
+        if self.maxsize is not None:
+            self.cache.move_to_end(key)
+        self.stats.hits += 1
+        return self.cache[key]
+
+    def add(self, key: str, value: VT) -> None:
+        """Store a value and index its names, replacing any previous value."""
+        if key in self.cache:
+            self.unindex(key)
+            self.cache.move_to_end(key)
         self.cache[key] = value
+        if self.ttl is not None:
+            self.expires[key] = time.monotonic() + self.ttl
+
+        # every key claiming an alias is kept, primary names first, so the
+        # alias can pass to another owner when its current one is removed
+        indexed: List[str] = []
         if "name" in value:
-            self.by_name[value["name"]] = key
+            name = value["name"]
+            self.by_name[name] = key
+            alias = normalize(name)
+            self.by_alias[alias] = key
+            self.owners.setdefault(alias, []).insert(0, key)
+            indexed.append(alias)
+        if self.aliases is not None:
+            for name in self.aliases(value):
+                alias = normalize(name) if name else ""
+                if alias and alias not in indexed:
+                    self.by_alias.setdefault(alias, key)
+                    self.owners.setdefault(alias, []).append(key)
+                    indexed.append(alias)
+        if indexed:
+            self.indexed[key] = indexed
 
-    def __delitem__(self, key: str) -> None:
-        return self.cache.__delitem__(key)
+        if self.maxsize is not None:
+            while len(self.cache) > self.maxsize:
+                self.remove(next(iter(self.cache)))
+                self.stats.evictions += 1
+
+    def remove(self, key: str) -> None:
+        """Drop a value and its name indexes."""
+        self.unindex(key)
+        del self.cache[key]
+        self.expires.pop(key, None)
+
+    def purge(self) -> None:
+        """Drop all expired values."""
+        if self.ttl is None:
+            return
+        now = time.monotonic()
+        for key in [key for key, expires in self.expires.items() if expires <= now]:
+            self.remove(key)
+            self.stats.expirations += 1
+
+    def unindex(self, key: str) -> None:
+        """Remove the name indexes pointing at the given key."""
+        value = self.cache.get(key)
+        if value is not None and "name" in value:
+            name = value["name"]
+            if self.by_name.get(name) == key:
+                del self.by_name[name]
+        for alias in self.indexed.pop(key, ()):
+            owners = self.owners[alias]
+            owners.remove(key)
+            if not owners:
+                del self.owners[alias]
+                del self.by_alias[alias]
+            elif self.by_alias[alias] == key:
+                self.by_alias[alias] = owners[0]
 
     def keys(self) -> Iterable[str]:
         return self.cache.keys()
@@ -59,25 +251,205 @@ class Cache:
         return self.cache.values()
 
     def get(self, key: str, default: Optional[VT] = None) -> Optional[VT]:
-        if key in self.cache:
-            return self.cache[key]
+        value = self.lookup(key)
+        return default if value is None else value
 
-        key = self.by_name.get(key, key)
-        return self.cache.get(key, default)
+    def find(self, name: str, default: Optional[VT] = None) -> Optional[VT]:
+        """Look up a value by name or alias, ignoring case and whitespace."""
+        key = self.by_alias.get(normalize(name))
+        if key is None:
+            self.stats.misses += 1
+            return default
+        return self.get(key, default)
 
     def fill(self, values: Iterable[VT], *, key: str = "id") -> None:
         for value in values:
             if not isinstance(value, self.type):
                 raise ValueError(f"{value[key]} is not {self.type.__name__}")
-            self.cache[value[key]] = value
-            if "name" in value:
-                self.by_name[value["name"]] = value[key]
+            self.add(value[key], value)
 
     def update(self, values: Mapping[str, VT]) -> None:
         for key in values:
             value = values[key]
             if not isinstance(value, self.type):
                 raise ValueError(f"{key} is not {self.type.__name__}")
-            self.cache[key] = value
-            if "name" in value:
-                self.by_name[value["name"]] = value["id"]
+            self.add(key, value)
+
+    async def fetch(self, key: str) -> VT:
+        """
+        Get a value, requesting it from the API if it isn't cached yet.
+
+        Concurrent fetches of the same key share a single request.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        if self.api is None or self.url is None:
+            raise KeyError(f"{self.type.__name__} {key} not in cache")
+
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.request(key))
+            self.inflight[key] = future
+            future.add_done_callback(lambda f: self.inflight.pop(key, None))
+
+        # one caller giving up shouldn't cancel the request for everyone else
+        return await asyncio.shield(future)
+
+    async def request(self, key: str) -> VT:
+        assert self.api is not None and self.url is not None
+        response = await self.api(self.url, **{self.param: key})
+        value = self.type.build(response[self.field])
+        self.add(key, value)
+        return value
+
+    async def prefetch(self, keys: Iterable[str]) -> None:
+        """Fetch all uncached keys concurrently, ignoring any that fail."""
+        missing = {key for key in keys if key not in self}
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(key: str) -> None:
+            async with semaphore:
+                await self.fetch(key)
+
+        results = await asyncio.gather(
+            *(bounded(key) for key in missing), return_exceptions=True
+        )
+        for key, result in zip(missing, results):
+            if isinstance(result, Exception):
+                log.debug(f"failed to fetch {self.type.__name__} {key}: {result!r}")
+
+
+class Membership:
+    """
+    Two-way index of which members belong to which groups.
+
+    Groups are user groups or conversations, keyed by ID, and members are
+    user IDs; both membership checks and lookups in either direction are
+    constant time, rather than scanning every group's member list.
+    """
+
+    def __init__(self) -> None:
+        self.by_group: Dict[str, Set[str]] = {}
+        self.by_member: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return self.by_group.__len__()
+
+    def __contains__(self, group: str) -> bool:
+        return group in self.by_group
+
+    def is_member(self, group: str, member: str) -> bool:
+        return member in self.by_group.get(group, ())
+
+    def members(self, group: str) -> Set[str]:
+        """Members of a group; the set is shared, and shouldn't be modified."""
+        return self.by_group.get(group, set())
+
+    def groups(self, member: str) -> Set[str]:
+        """Groups a member belongs to; the set is shared, like members()."""
+        return self.by_member.get(member, set())
+
+    def set(self, group: str, members: Iterable[str]) -> None:
+        """Replace the members of a group."""
+        self.remove(group)
+        current = self.by_group[group] = set(members)
+        for member in current:
+            self.by_member.setdefault(member, set()).add(group)
+
+    def add(self, group: str, member: str) -> None:
+        self.by_group.setdefault(group, set()).add(member)
+        self.by_member.setdefault(member, set()).add(group)
+
+    def discard(self, group: str, member: str) -> None:
+        self.by_group.get(group, set()).discard(member)
+        groups = self.by_member.get(member)
+        if groups is not None:
+            groups.discard(group)
+            if not groups:
+                del self.by_member[member]
+
+    def remove(self, group: str) -> None:
+        """Drop a group and all of its memberships."""
+        for member in self.by_group.pop(group, ()):
+            groups = self.by_member[member]
+            groups.discard(group)
+            if not groups:
+                del self.by_member[member]
+
+
+class ResponseCache:
+    """
+    Cache API responses by method and arguments, with per-method TTLs.
+
+    Only methods listed in ttls are cached.  Concurrent calls with the same
+    arguments share one request, and its response is reused until the TTL
+    runs out; failed requests are not cached.  With maxsize, the least
+    recently used responses are evicted once the cache is full.  Cached
+    responses are shared between callers, and shouldn't be modified.
+    """
+
+    def __init__(
+        self, ttls: Mapping[str, float] = None, *, maxsize: int = 1024
+    ) -> None:
+        self.ttls = RESPONSE_TTLS if ttls is None else ttls
+        self.maxsize = maxsize
+        self.cache: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self.inflight: Dict[Tuple, asyncio.Future] = {}
+        self.stats = ResponseCacheStats()
+
+    def __contains__(self, method: str) -> bool:
+        return method in self.ttls
+
+    def __len__(self) -> int:
+        return self.cache.__len__()
+
+    async def get(
+        self,
+        method: str,
+        kwargs: Mapping[str, str],
+        request: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Get a cached response, or the response from a shared request."""
+        key = (method, tuple(sorted(kwargs.items())))
+        if key in self.cache:
+            expires, value = self.cache[key]
+            if expires > time.monotonic():
+                self.cache.move_to_end(key)
+                self.stats.hits += 1
+                return value
+            del self.cache[key]
+            self.stats.expirations += 1
+
+        future = self.inflight.get(key)
+        if future is None:
+            self.stats.misses += 1
+            future = asyncio.ensure_future(request())
+            self.inflight[key] = future
+            future.add_done_callback(lambda f: self.store(key, f))
+        else:
+            self.stats.coalesced += 1
+
+        return await asyncio.shield(future)
+
+    def store(self, key: Tuple, future: asyncio.Future) -> None:
+        self.inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        self.cache[key] = (time.monotonic() + self.ttls[key[0]], future.result())
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, method: str = None) -> None:
+        """Drop cached responses for the given method, or for all methods."""
+        if method is None:
+            self.cache.clear()
+            return
+        for key in [key for key in self.cache if key[0] == method]:
+            del self.cache[key]
@@ -8,9 +8,23 @@ Based on the Object Types documentation at https://api.slack.com/types
 """
 
 import logging
-
-from typing import Any, Dict, List, Mapping, Type, TypeVar
-from attr import asdict, dataclass, fields_dict, ib, make_class
+import sys
+
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Tuple,
+    Type,
+    TypeVar,
+)
+from attr import dataclass, fields, has, ib, make_class
 
 T = TypeVar("T", bound="Auto")
 
@@ -18,37 +32,142 @@ Generic = Mapping[str, Any]  # subvalues that we don't (yet?) care about
 URL = str
 HTML = str
 
+# string fields whose values repeat across many objects
+INTERNED = frozenset(
+    ["color", "creator", "locale", "team", "team_id", "tz", "tz_label"]
+)
+
 log = logging.getLogger(__name__)
 
+ClassKey = Tuple[type, str, FrozenSet[str]]
+Builder = Callable[[Generic], Any]
+
+
+class ClassCache:
+    """
+    LRU registry of generated classes, keyed by base class, name, and field names.
+
+    Events of the same shape reuse one generated class rather than calling
+    make_class for every message.  A maxsize of zero disables caching.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.classes: "OrderedDict[ClassKey, type]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+    def get(self, base: type, name: str, keys: Iterable[str]) -> type:
+        """Return a generated class with the given fields, creating it if needed."""
+        keys = tuple(keys)
+        key = (base, name, frozenset(keys))
+        kls = self.classes.get(key)
+        if kls is not None:
+            self.hits += 1
+            self.classes.move_to_end(key)
+            return kls
+
+        self.misses += 1
+        kls = make_class(name, {k: ib(default=None) for k in keys}, bases=(base,))
+        if self.maxsize > 0:
+            self.classes[key] = kls
+            if len(self.classes) > self.maxsize:
+                self.classes.popitem(last=False)
+        return kls
+
+    def clear(self) -> None:
+        self.classes.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+classes = ClassCache()
+
 
 class Auto:
+    __slots__ = ()
+
+    # string fields that build() interns; set on compact types
+    interned_fields: ClassVar[FrozenSet[str]] = frozenset()
+
     def __init__(self, **kwargs) -> None:
         # silence mypy by have a default constructor
         pass
 
     def __contains__(self, key: str) -> bool:
-        return key in asdict(self)
+        return key in self.field_names()
 
     def __getitem__(self, key: str) -> Any:
-        return asdict(self)[key]
+        if key in self.field_names():
+            return getattr(self, key)
+        raise KeyError(key)
+
+    @classmethod
+    def field_names(cls) -> FrozenSet[str]:
+        """Names of the attrs fields on this class, computed once per class."""
+        names = cls.__dict__.get("_field_names")
+        if names is None:
+            names = frozenset(a.name for a in getattr(cls, "__attrs_attrs__", ()))
+            setattr(cls, "_field_names", names)
+        return names
 
     @classmethod
     def build(cls: Type[T], data: Generic) -> T:
         """Build objects from dictionaries, recursively."""
-        fields = fields_dict(cls)
-        kwargs: Dict[str, Any] = {}
-        for key, value in data.items():
-            if key in fields:
+        builder = cls.__dict__.get("_builder")
+        if builder is None:
+            builder = cls.compile()
+        return builder(data)
+
+    @classmethod
+    def compile(cls) -> Builder:
+        """
+        Create the builder used by build(), once per class.
+
+        Unknown keys are dropped, fields typed as Auto subclasses are built
+        recursively, and mappings for untyped or dict fields are generated.
+        """
+        names = cls.field_names()
+        nested: List[Tuple[str, Builder]] = []
+        for attribute in getattr(cls, "__attrs_attrs__", ()):
+            t = attribute.type
+            if isinstance(t, type) and issubclass(t, Auto):
+                nested.append((attribute.name, t.build))
+            elif (
+                t is None
+                or t is Any
+                or (isinstance(t, type) and issubclass(t, Mapping))
+            ):
+                title = attribute.name.title()
+                nested.append(
+                    (
+                        attribute.name,
+                        lambda value, title=title: Auto.generate(value, title),
+                    )
+                )
+
+        interned = cls.interned_fields
+
+        def builder(data: Generic) -> Any:
+            kwargs = {key: value for key, value in data.items() if key in names}
+            for key, convert in nested:
+                value = kwargs.get(key)
                 if isinstance(value, Mapping):
-                    t = fields[key].type
-                    if issubclass(t, Auto):
-                        value = t.build(value)
-                    else:
-                        value = Auto.generate(value, name=key.title())
-                kwargs[key] = value
-            else:
-                log.debug(f"got unknown attribute {key} for {cls.__name__}")
-        return cls(**kwargs)
+                    kwargs[key] = convert(value)
+            for key in interned:
+                value = kwargs.get(key)
+                if isinstance(value, str):
+                    kwargs[key] = sys.intern(value)
+            if len(kwargs) < len(data) and log.isEnabledFor(logging.DEBUG):
+                for key in data.keys() - names:
+                    log.debug(f"got unknown attribute {key} for {cls.__name__}")
+            return cls(**kwargs)
+
+        setattr(cls, "_builder", builder)
+        return builder
 
     @classmethod
     def generate(
@@ -57,7 +176,7 @@ class Auto:
         """Build dataclasses and objects from dictionaries, recursively."""
         if name is None:
             name = cls.__name__
-        kls = make_class(name, {k: ib(default=None) for k in data}, bases=(cls,))
+        kls = classes.get(cls, name, data)
         data = {
             k: (
                 cls.generate(v, k.title())
@@ -69,6 +188,36 @@ class Auto:
         return kls(**data)
 
 
+compacted: Dict[type, type] = {}
+
+
+def compact(cls: Type[T]) -> Type[T]:
+    """
+    Slotted, memory-compact variant of an Auto type.
+
+    Objects have no instance __dict__, nested Auto fields use compact types
+    too, and build() interns strings that repeat across objects, like team_id
+    and tz.  Compact types are not subclasses of the originals.
+    """
+    if cls in compacted:
+        return compacted[cls]
+
+    attributes = {}
+    for attribute in fields(cls):
+        t = attribute.type
+        default = attribute.default
+        if isinstance(t, type) and issubclass(t, Auto) and has(t):
+            t = compact(t)
+            if isinstance(default, Auto):
+                default = t(**{a.name: getattr(default, a.name) for a in fields(t)})
+        attributes[attribute.name] = ib(default=default, type=t)
+
+    kls = make_class(cls.__name__, attributes, bases=(Auto,), slots=True)
+    kls.interned_fields = INTERNED & kls.field_names()
+    compacted[cls] = kls
+    return kls
+
+
 @dataclass
 class Value(Auto):
     value: str = ""
@@ -136,6 +285,49 @@ class Event(Auto):
     type: str = ""
 
 
+class LazyEvent(Event):
+    """
+    Event backed by its decoded message.
+
+    The type is set up front, while other fields are looked up from the
+    message only when first accessed.
+    """
+
+    def __init__(self, data: Generic) -> None:
+        super().__init__(type=data.get("type", ""))
+        self._data = data
+
+    def __getattr__(self, key: str) -> Any:
+        data = self.__dict__.get("_data")
+        if data is None or key not in data:
+            raise AttributeError(f"{self.__class__.__name__} has no attribute {key}")
+        value = data[key]
+        setattr(self, key, value)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def to_dict(self) -> Generic:
+        """The decoded message backing this event; it shouldn't be modified."""
+        return self._data
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._data == other._data
+
+    def __ne__(self, other: Any) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._data!r})"
+
+
 @dataclass
 class EventWrapper(Auto):
     token: str = ""
@@ -0,0 +1,6 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Benchmarks for aioslack hot paths, run with `python3 -m bench [name ...]`.
+"""
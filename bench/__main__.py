@@ -0,0 +1,29 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import sys
+
+from .base import BENCHMARKS
+from . import (
+    build,
+    cache,
+    decode,
+    encode,
+    generate,
+    markup,
+    members,
+    memory,
+)  # noqa: F401 register benchmarks
+
+
+def main() -> None:
+    names = sys.argv[1:] or sorted(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            sys.exit(f"unknown benchmark {name}, try: {', '.join(sorted(BENCHMARKS))}")
+        print(f"{name}:")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+"""
+Timing helpers and synthetic Slack payloads shaped like real API responses.
+"""
+
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {}
+
+TIMEZONES = ["America/Los_Angeles", "America/New_York", "Europe/London", "Asia/Tokyo"]
+COLORS = ["9f69e7", "4bbe2e", "e7392d", "3c989f", "674b1b"]
+
+
+def benchmark(fn: Callable[[], None]) -> Callable[[], None]:
+    """Register a benchmark by function name."""
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def measure(fn: Callable[[], Any], repeat: int = 3) -> float:
+    """Best wall time of several runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label: str, count: float, seconds: float, unit: str = "ops") -> None:
+    print(f"  {label:<24} {count / seconds:>14,.0f} {unit}/sec  ({seconds:.3f}s)")
+
+
+def user(idx: int) -> Dict[str, Any]:
+    name = f"user{idx}"
+    return {
+        "id": f"U{idx:08X}",
+        "team_id": "T0000001",
+        "name": name,
+        "deleted": False,
+        "color": COLORS[idx % len(COLORS)],
+        "real_name": f"User Number{idx}",
+        "tz": TIMEZONES[idx % len(TIMEZONES)],
+        "tz_label": "Pacific Daylight Time",
+        "tz_offset": -25200,
+        "profile": {
+            "avatar_hash": f"g{idx:011x}",
+            "status_text": "",
+            "status_emoji": "",
+            "real_name": f"User Number{idx}",
+            "display_name": f"un{idx}",
+            "real_name_normalized": f"User Number{idx}",
+            "display_name_normalized": f"un{idx}",
+            "email": f"{name}@example.com",
+            "image_24": f"https://example.com/{idx}_24.png",
+            "image_32": f"https://example.com/{idx}_32.png",
+            "image_48": f"https://example.com/{idx}_48.png",
+            "image_72": f"https://example.com/{idx}_72.png",
+            "image_192": f"https://example.com/{idx}_192.png",
+            "image_512": f"https://example.com/{idx}_512.png",
+            "team": "T0000001",
+        },
+        "is_admin": False,
+        "is_owner": False,
+        "is_primary_owner": False,
+        "is_restricted": False,
+        "is_ultra_restricted": False,
+        "is_bot": False,
+        "is_stranger": False,
+        "updated": 1528000000 + idx,
+        "is_app_user": False,
+        "has_2fa": idx % 2 == 0,
+        "locale": "en-US",
+        "presence": "away",
+    }
+
+
+def channel(idx: int, members: List[str]) -> Dict[str, Any]:
+    return {
+        "id": f"C{idx:08X}",
+        "name": f"channel-{idx}",
+        "is_channel": True,
+        "created": 1360782804,
+        "creator": "U00000001",
+        "is_archived": False,
+        "is_general": idx == 0,
+        "name_normalized": f"channel-{idx}",
+        "is_member": True,
+        "members": members,
+        "topic": {"value": f"topic {idx}", "creator": "U00000001", "last_set": 0},
+        "purpose": {"value": f"purpose {idx}", "creator": "", "last_set": 0},
+        "previous_names": [],
+    }
+
+
+def rtm_start(users: int, channels: int, members: int = 50) -> Dict[str, Any]:
+    user_ids = [f"U{idx:08X}" for idx in range(users)]
+    rng = random.Random(users)
+    return {
+        "ok": True,
+        "url": "wss://example.com/websocket",
+        "self": {"id": "U00000000", "name": "bot"},
+        "team": {"id": "T0000001", "name": "Example", "domain": "example"},
+        "users": [user(idx) for idx in range(users)],
+        "channels": [
+            channel(idx, rng.sample(user_ids, min(members, users)))
+            for idx in range(channels)
+        ],
+        "groups": [],
+    }
+
+
+def events(count: int, users: int = 1000, channels: int = 100) -> List[Dict[str, Any]]:
+    """A stream of RTM events in roughly the mix seen on a busy workspace."""
+    rng = random.Random(count)
+    stream: List[Dict[str, Any]] = []
+    for idx in range(count):
+        uid = f"U{rng.randrange(users):08X}"
+        cid = f"C{rng.randrange(channels):08X}"
+        ts = f"{1528000000 + idx}.{idx % 1000000:06d}"
+        kind = rng.random()
+        if kind < 0.35:
+            event = {
+                "type": "message",
+                "channel": cid,
+                "user": uid,
+                "text": f"hello <@U{rng.randrange(users):08X}> how goes #{idx}",
+                "ts": ts,
+                "team": "T0000001",
+            }
+        elif kind < 0.60:
+            event = {"type": "user_typing", "channel": cid, "user": uid}
+        elif kind < 0.80:
+            event = {"type": "presence_change", "user": uid, "presence": "active"}
+        elif kind < 0.90:
+            event = {
+                "type": "reaction_added",
+                "user": uid,
+                "reaction": "thumbsup",
+                "item_user": uid,
+                "item": {"type": "message", "channel": cid, "ts": ts},
+                "event_ts": ts,
+            }
+        else:
+            event = {
+                "type": "message",
+                "subtype": "message_changed",
+                "channel": cid,
+                "hidden": True,
+                "message": {"type": "message", "user": uid, "text": "edited", "ts": ts},
+                "ts": ts,
+                "event_ts": ts,
+            }
+        stream.append(event)
+    return stream
@@ -0,0 +1,52 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+from typing import Any, Dict, Mapping
+
+from attr import fields_dict
+
+from aioslack.types import Auto, Channel, Generic, User
+from .base import benchmark, measure, report, rtm_start
+
+
+def legacy_build(cls: Any, data: Mapping[str, Any]) -> Any:
+    """The previous Auto.build, inspecting fields on every call."""
+    fields = fields_dict(cls)
+    kwargs: Dict[str, Any] = {}
+    for key, value in data.items():
+        if key in fields:
+            if isinstance(value, Mapping):
+                t = fields[key].type
+                if isinstance(t, type) and issubclass(t, Auto):
+                    value = legacy_build(t, value)
+                elif t is not Generic:
+                    value = Auto.generate(value, name=key.title())
+            kwargs[key] = value
+        else:
+            # the debug message was formatted even with logging disabled
+            message = f"got unknown attribute {key} for {cls.__name__}"  # noqa
+    return cls(**kwargs)
+
+
+@benchmark
+def build() -> None:
+    """User.build and Channel.build over a synthetic rtm.start payload."""
+    payload = rtm_start(users=50000, channels=5000)
+    users = payload["users"]
+    channels = payload["channels"]
+
+    def legacy() -> None:
+        for item in users:
+            legacy_build(User, item)
+        for item in channels:
+            legacy_build(Channel, item)
+
+    def compiled() -> None:
+        for item in users:
+            User.build(item)
+        for item in channels:
+            Channel.build(item)
+
+    count = len(users) + len(channels)
+    report("per-call inspection", count, measure(legacy), "objects")
+    report("compiled builders", count, measure(compiled), "objects")
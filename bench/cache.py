@@ -0,0 +1,27 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+from attr import asdict
+
+from aioslack.state import Cache
+from aioslack.types import User
+from .base import benchmark, measure, report, rtm_start
+
+
+@benchmark
+def cache_fill() -> None:
+    """Cache.fill with 50k users from an rtm.start payload."""
+    payload = rtm_start(users=50000, channels=0)
+    users = [User.build(item) for item in payload["users"]]
+
+    def legacy() -> None:
+        # what mapping access used to cost: a full asdict() per lookup
+        for user in users:
+            if "name" in asdict(user):
+                asdict(user)["name"]
+
+    def fill() -> None:
+        Cache(User).fill(users)
+
+    report("asdict lookups", len(users), measure(legacy, repeat=1), "users")
+    report("Cache.fill", len(users), measure(fill), "users")
@@ -0,0 +1,34 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import json
+
+from aioslack.codec import DECODERS, get_loads, response_loads
+from .base import benchmark, events, measure, report, rtm_start
+
+
+@benchmark
+def decode() -> None:
+    """Decode throughput of RTM events and an rtm.start response."""
+    messages = [json.dumps(event) for event in events(50000)]
+    response = json.dumps(rtm_start(users=20000, channels=2000)).encode("utf-8")
+
+    for name in DECODERS:
+        try:
+            loads = get_loads(name)
+        except ImportError:
+            print(f"  {name:<24} not installed")
+            continue
+
+        def run_events() -> None:
+            for message in messages:
+                loads(message)
+
+        decode_response = response_loads(loads)
+        report(f"{name} events", len(messages), measure(run_events), "events")
+        report(
+            f"{name} rtm.start",
+            len(response) / 2**20,
+            measure(lambda: decode_response(response)),
+            "MiB",
+        )
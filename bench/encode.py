@@ -0,0 +1,47 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import random
+from typing import Match
+from unittest.mock import patch
+
+from aioslack.core import Slack
+from aioslack.types import User
+from .base import benchmark, measure, report, rtm_start
+
+
+@benchmark
+def encode() -> None:
+    """Slack.encode of a message corpus against 50k cached users."""
+    payload = rtm_start(users=50000, channels=0)
+    rng = random.Random(50000)
+    corpus = [
+        f"hey @user{rng.randrange(60000)} and @un{rng.randrange(50000)}, "
+        f"see @here for the @user{rng.randrange(50000)} update"
+        for _ in range(2000)
+    ]
+
+    with patch("aioslack.core.aiohttp"):
+        slack = Slack(token="xoxb-bench")
+    slack.users.fill(User.build(item) for item in payload["users"])
+
+    def legacy() -> None:
+        # the previous linear scan over every cached user
+        def callback(match: Match) -> str:
+            name = match.group("name").lower()
+            if name in ["here", "everyone", "channel"]:
+                return f"<!{name}>"
+            for user in slack.users.values():
+                if user.name == name:
+                    return f"<@{user.id}>"
+            return match.group(0)
+
+        for text in corpus[:20]:
+            slack.encode_re.sub(callback, text)
+
+    def indexed() -> None:
+        for text in corpus:
+            slack.encode(text)
+
+    report("linear scan", 20, measure(legacy, repeat=1), "messages")
+    report("name index", len(corpus), measure(indexed), "messages")
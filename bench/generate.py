@@ -0,0 +1,53 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+from aioslack.types import Event, LazyEvent, classes
+from .base import benchmark, events, measure, report
+
+
+@benchmark
+def generate() -> None:
+    """Event.generate over an RTM stream, with and without the class cache."""
+    stream = events(20000)
+
+    def run(count: int) -> None:
+        for data in stream[:count]:
+            Event.generate(data)
+
+    maxsize = classes.maxsize
+    try:
+        classes.clear()
+        classes.maxsize = 0
+        report("uncached", 2000, measure(lambda: run(2000), repeat=1), "events")
+
+        classes.clear()
+        classes.maxsize = maxsize
+        report("cached", len(stream), measure(lambda: run(len(stream))), "events")
+        print(f"  {len(classes)} classes, {classes.hits} hits, {classes.misses} misses")
+    finally:
+        classes.clear()
+        classes.maxsize = maxsize
+
+
+@benchmark
+def lazy() -> None:
+    """Event construction for an RTM stream where consumers only check type."""
+    stream = events(50000)
+
+    def generated() -> None:
+        for data in stream:
+            Event.generate(data, recursive=False).type
+
+    def wrapped() -> None:
+        for data in stream:
+            LazyEvent(data).type
+
+    def filtered() -> None:
+        wanted = frozenset(["message"])
+        for data in stream:
+            if data["type"] in wanted:
+                LazyEvent(data).type
+
+    report("Event.generate", len(stream), measure(generated), "events")
+    report("LazyEvent", len(stream), measure(wrapped), "events")
+    report("LazyEvent, messages", len(stream), measure(filtered), "events")
@@ -0,0 +1,81 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import random
+import re
+from typing import List, Match, Optional
+from unittest.mock import patch
+
+from aioslack.core import Slack
+from aioslack.types import Channel, User
+from .base import benchmark, measure, report, rtm_start
+
+
+@benchmark
+def markup() -> None:
+    """Slack.decode of a message corpus, against the original user-only decode."""
+    payload = rtm_start(users=5000, channels=500, members=5)
+    rng = random.Random(5000)
+    corpus = []
+    for _ in range(100000):
+        kind = rng.random()
+        uid = f"U{rng.randrange(6000):08X}"
+        cid = f"C{rng.randrange(600):08X}"
+        if kind < 0.4:
+            text = f"<@{uid}> can you look at this?"
+        elif kind < 0.6:
+            text = f"<!here> deploy is out, details in <#{cid}|deploys>"
+        elif kind < 0.8:
+            text = f"<@{uid}> see <https://example.com/{uid}|the doc> &amp; <#{cid}>"
+        else:
+            text = "no markup in this message at all, just plain text"
+        corpus.append(text)
+
+    with patch("aioslack.core.aiohttp"):
+        slack = Slack(token="xoxb-bench")
+    slack.users.fill(User.build(item) for item in payload["users"])
+    slack.channels.fill(Channel.build(item) for item in payload["channels"])
+
+    old_re = re.compile(r"<(?:@(?P<userid>\w+)|!(?P<alias>\w+))>")
+
+    def get(key: str) -> Optional[User]:
+        # the pre-series Cache.get
+        cache = slack.users.cache
+        if key in cache:
+            return cache[key]
+        key = slack.users.by_name.get(key, key)
+        return cache.get(key, None)
+
+    # messages the original decode fully handles, so both produce the same text
+    mentions = [text for text in corpus if "<#" not in text and "&" not in text]
+
+    def original(corpus: List[str] = mentions) -> None:
+        # the pre-series Slack.decode, which only handled <@id> and <!alias>
+        def callback(match: Match) -> str:
+            m = match.groupdict()
+            if m["userid"]:
+                user = get(m["userid"])
+                if user is None:
+                    username = m["userid"]
+                else:
+                    username = user.name
+            elif m["alias"]:
+                username = m["alias"]
+            return f"@{username}"
+
+        for text in corpus:
+            old_re.sub(callback, text)
+
+    def single(corpus: List[str] = mentions) -> None:
+        for text in corpus:
+            slack.decode(text)
+
+    report("original, mentions", len(mentions), measure(original), "messages")
+    report("single pass, mentions", len(mentions), measure(single), "messages")
+    # the original leaves channel links, urls, and escapes in the text
+    report(
+        "single pass, all markup",
+        len(corpus),
+        measure(lambda: single(corpus)),
+        "messages",
+    )
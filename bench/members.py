@@ -0,0 +1,48 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import random
+
+from aioslack.state import Membership
+from aioslack.types import Channel
+from .base import benchmark, measure, report, rtm_start
+
+
+@benchmark
+def members() -> None:
+    """Channel membership queries on a workspace of 20k users, 2k channels."""
+    payload = rtm_start(users=20000, channels=2000, members=200)
+    channels = [Channel.build(item) for item in payload["channels"]]
+    rng = random.Random(20000)
+    queries = [
+        (rng.choice(channels).id, f"U{rng.randrange(20000):08X}") for _ in range(2000)
+    ]
+    by_id = {channel.id: channel for channel in channels}
+
+    index = Membership()
+
+    def build() -> None:
+        for channel in channels:
+            index.set(channel.id, channel.members)
+
+    def scan_member() -> None:
+        for cid, uid in queries:
+            uid in by_id[cid].members
+
+    def scan_channels() -> None:
+        for _, uid in queries[:20]:
+            [channel.id for channel in channels if uid in channel.members]
+
+    def indexed_member() -> None:
+        for cid, uid in queries:
+            index.is_member(cid, uid)
+
+    def indexed_channels() -> None:
+        for _, uid in queries:
+            index.groups(uid)
+
+    report("build index", len(channels), measure(build), "channels")
+    report("is member, list scan", len(queries), measure(scan_member), "queries")
+    report("is member, index", len(queries), measure(indexed_member), "queries")
+    report("channels of, scan", 20, measure(scan_channels, repeat=1), "queries")
+    report("channels of, index", len(queries), measure(indexed_channels), "queries")
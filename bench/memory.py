@@ -0,0 +1,37 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import gc
+import json
+import tracemalloc
+from typing import Any, List, Type
+
+from aioslack.types import Channel, User, compact
+from .base import benchmark, rtm_start
+
+
+def retained(user: Type[Any], channel: Type[Any], payload: str) -> int:
+    """Bytes still allocated by built objects once the payload is dropped."""
+    gc.collect()
+    tracemalloc.start()
+    data = json.loads(payload)
+    objects: List[Any] = [user.build(item) for item in data["users"]]
+    objects += [channel.build(item) for item in data["channels"]]
+    del data
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+@benchmark
+def memory() -> None:
+    """Resident size of 100k users and 10k channels, regular vs compact."""
+    # round trip through json so strings are distinct objects, as when decoded
+    payload = json.dumps(rtm_start(users=100000, channels=10000))
+
+    regular = retained(User, Channel, payload)
+    compacted = retained(compact(User), compact(Channel), payload)
+    print(f"  {'regular':<24} {regular / 2 ** 20:>10,.1f} MiB")
+    print(f"  {'compact':<24} {compacted / 2 ** 20:>10,.1f} MiB")
@@ -1,6 +1,13 @@
 # Copyright 2018 John Reese
 # Licensed under the MIT license
 
+from .codec import CodecTest
 from .core import CoreTest
+from .dispatch import DispatchTest
+from .events import EventsTest
+from .pool import PoolTest
+from .ratelimit import RateLimitTest
+from .sender import SenderTest
+from .shard import ShardTest
 from .state import StateTest
 from .types import TypesTest
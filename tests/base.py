@@ -4,7 +4,9 @@
 import asyncio
 
 from functools import wraps
+from json import dumps
 from typing import Any, Callable
+from unittest.mock import MagicMock
 
 SENTINEL = object()
 
@@ -39,3 +41,56 @@ class awaitable:
             return self.obj
 
         return wrapped().__await__()
+
+
+class websocket:
+    def __init__(self, *events: Any) -> None:
+        self.messages = []
+        for idx, event in enumerate(events):
+            mock = MagicMock(name=f"event-{idx}")
+            mock.data = dumps(event)
+            self.messages.append(mock)
+        self.closed = False
+
+    def __aiter__(self) -> "websocket":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self.closed or not self.messages:
+            raise StopAsyncIteration
+        return self.messages.pop(0)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+RTM_START = {
+    "ok": True,
+    "url": "https://frob",
+    "self": {},
+    "team": {},
+    "channels": [],
+    "users": [],
+    "groups": [],
+}
+
+
+def response(data: Any) -> awaitable:
+    """A successful HTTP response with a JSON body, as returned by session.post."""
+    mock = MagicMock(name="response")
+    mock.status = 200
+    mock.read.return_value = awaitable(dumps(data))
+    return awaitable(mock)
+
+
+def rtm_session(aiohttp: MagicMock, *events: Any) -> MagicMock:
+    """
+    Fake session for a patched aiohttp module, answering every API call with
+    the RTM_START response, and connecting to a websocket sending events.
+    """
+    session = MagicMock(name="session")
+    session.post.return_value = response(RTM_START)
+    session.close.return_value = awaitable(None)
+    session.ws_connect.return_value = awaitable(websocket(*events))
+    aiohttp.ClientSession.return_value = session
+    return session
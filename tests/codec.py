@@ -0,0 +1,23 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import json
+from unittest import TestCase
+
+from aioslack.codec import get_loads, response_loads
+
+
+class CodecTest(TestCase):
+    def test_get_loads(self):
+        self.assertIs(get_loads(), json.loads)
+        self.assertIs(get_loads("json"), json.loads)
+        self.assertEqual(get_loads("auto")('{"a": [1]}'), {"a": [1]})
+
+        with self.assertRaises(ValueError):
+            get_loads("yaml")
+
+    def test_response_loads(self):
+        loads = response_loads(json.loads)
+        value = loads(b'{"ok": true, "self": {"id": "U1"}}')
+        self.assertEqual(value, {"ok": True, "self_": {"id": "U1"}})
+        self.assertEqual(loads("[1, 2]"), [1, 2])
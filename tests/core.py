@@ -1,12 +1,28 @@
 # Copyright 2018 John Reese
 # Licensed under the MIT license
 
+import asyncio
+import os
+import time
+from json import dumps
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 from unittest.mock import MagicMock, patch, PropertyMock
 
+from aiohttp import ClientError
+
 from aioslack.core import Slack, SlackError
-from aioslack.types import Auto
-from .base import async_test, awaitable
+from aioslack.types import (
+    Auto,
+    Channel,
+    Event,
+    Group,
+    LazyEvent,
+    Profile,
+    User,
+    UserGroup,
+)
+from .base import RTM_START, async_test, awaitable, response, rtm_session, websocket
 
 
 class CoreTest(TestCase):
@@ -17,7 +33,7 @@ class CoreTest(TestCase):
 
         response = MagicMock(name="response")
         response.status = 200
-        response.json.return_value = awaitable(value)
+        response.read.return_value = awaitable(dumps(value))
 
         session = MagicMock(name="session")
         session.post.return_value = awaitable(response)
@@ -43,7 +59,7 @@ class CoreTest(TestCase):
 
         response = MagicMock(name="response")
         response.status = 200
-        response.json.return_value = awaitable(value)
+        response.read.return_value = awaitable(dumps(value))
 
         session = MagicMock(name="session")
         session.post.return_value = awaitable(response)
@@ -63,35 +79,107 @@ class CoreTest(TestCase):
 
     @patch("aioslack.core.aiohttp")
     @async_test
-    async def test_rtm(self, aiohttp):
-        rtm_response = {
-            "ok": True,
-            "url": "https://frob",
-            "self": {},
-            "team": {},
-            "channels": [],
-            "users": [],
-            "groups": [],
-        }
-        events = [{"type": "hello"}]
+    async def test_api_responses(self, aiohttp):
+        response = MagicMock(name="response")
+        response.status = 200
+        response.read.return_value = awaitable(dumps({"ok": True, "user_id": "U1"}))
+
+        session = MagicMock(name="session")
+        session.post.return_value = awaitable(response)
+        session.close.return_value = awaitable(None)
+
+        aiohttp.ClientSession.return_value = session
+
+        async with Slack(token="xoxb-foo", responses=True) as slack:
+            values = await asyncio.gather(*(slack.api("auth.test") for _ in range(3)))
+            self.assertEqual([value.user_id for value in values], ["U1"] * 3)
+            await slack.api("auth.test")
+            self.assertEqual(session.post.call_count, 1)
+
+            await slack.api("chat.postMessage", channel="C1", text="hi")
+            await slack.api("chat.postMessage", channel="C1", text="hi")
+            self.assertEqual(session.post.call_count, 3)
+
+        async with Slack(token="xoxb-foo") as slack:
+            self.assertIsNone(slack.responses)
+            await slack.api("auth.test")
+            await slack.api("auth.test")
+            self.assertEqual(session.post.call_count, 5)
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_api_rate_limited(self, aiohttp):
+        limited = MagicMock(name="limited")
+        limited.status = 429
+        limited.headers = {"Retry-After": "0"}
 
         response = MagicMock(name="response")
         response.status = 200
-        response.json.return_value = awaitable(rtm_response)
+        response.read.return_value = awaitable(dumps({"ok": True}))
+
+        session = MagicMock(name="session")
+        session.post.side_effect = [awaitable(limited), awaitable(response)]
+        session.close.return_value = awaitable(None)
+
+        aiohttp.ClientSession.return_value = session
+
+        async with Slack(token="xoxb-foo") as slack:
+            value = await slack.api("chat.postMessage", channel="C1", text="hi")
+            self.assertTrue(value.ok)
+            self.assertEqual(session.post.call_count, 2)
+            self.assertEqual(slack.limiter.stats.throttled, 1)
+            self.assertEqual(slack.limiter.stats.retries, 1)
 
-        async def websocket():
-            for idx, event in enumerate(events):
-                mock = MagicMock(name=f"event-{idx}")
-                mock.json.return_value = event
-                yield mock
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_paginate(self, aiohttp):
+        pages = [
+            {
+                "ok": True,
+                "members": [{"id": "U1", "team_id": "T1", "name": "jim"}],
+                "response_metadata": {"next_cursor": "abc"},
+            },
+            {
+                "ok": True,
+                "members": [{"id": "U2", "team_id": "T1", "name": "bob"}],
+                "response_metadata": {"next_cursor": ""},
+            },
+        ]
+        responses = []
+        for page in pages:
+            response = MagicMock(name="response")
+            response.status = 200
+            response.read.return_value = awaitable(dumps(page))
+            responses.append(awaitable(response))
 
         session = MagicMock(name="session")
-        session.post.return_value = awaitable(response)
+        session.post.side_effect = responses
         session.close.return_value = awaitable(None)
-        session.ws_connect.return_value = awaitable(websocket())
 
         aiohttp.ClientSession.return_value = session
 
+        async with Slack(token="xoxb-foo") as slack:
+            users = [
+                user
+                async for user in slack.paginate("users.list", limit=1, cursor="xyz")
+            ]
+            self.assertEqual([user.name for user in users], ["jim", "bob"])
+            self.assertIsInstance(users[0], User)
+            self.assertEqual(
+                [call[1]["data"] for call in session.post.call_args_list],
+                [{"limit": "1", "cursor": "xyz"}, {"limit": "1", "cursor": "abc"}],
+            )
+
+            with self.assertRaises(SlackError):
+                async for item in slack.paginate("chat.postMessage"):
+                    pass
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_rtm(self, aiohttp):
+        events = [{"type": "hello"}]
+        session = rtm_session(aiohttp, *events)
+
         async with Slack(token="xoxb-foo") as slack:
             k = 0
             async for event in slack.rtm():
@@ -101,6 +189,539 @@ class CoreTest(TestCase):
                 headers={"Authorization": "Bearer xoxb-foo"}
             )
             session.post.assert_called_with("https://slack.com/api/rtm.start", data={})
-            session.ws_connect.assert_called_with(rtm_response["url"])
+            session.ws_connect.assert_called_with(RTM_START["url"])
+
+        session.close.assert_called_once()
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_rtm_types(self, aiohttp):
+        events = [
+            {"type": "hello"},
+            {"type": "user_typing", "channel": "C1", "user": "U1"},
+            {"type": "team_join", "user": {"id": "U1", "team_id": "T1", "name": "jim"}},
+            {"type": "message", "channel": "C1", "user": "U1", "text": "hi"},
+        ]
+        session = rtm_session(aiohttp, *events)
+
+        async with Slack(token="xoxb-foo") as slack:
+            received = [
+                event async for event in slack.rtm(types=["message"], update=True)
+            ]
+            self.assertEqual(len(received), 1)
+            self.assertIsInstance(received[0], LazyEvent)
+            self.assertEqual(received[0].text, "hi")
+            self.assertEqual(slack.users["jim"].id, "U1")
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_rtm_buffer(self, aiohttp):
+        events = [{"type": "hello"}]
+        events += [{"type": "user_typing", "user": f"U{idx}"} for idx in range(5)]
+        events += [{"type": "message", "text": "hi"}]
+        session = rtm_session(aiohttp, *events)
+
+        async with Slack(token="xoxb-foo") as slack:
+            received = []
+            async for event in slack.rtm(buffer=2, droppable=["user_typing"]):
+                received.append(event)
+                # let the reader fill the buffer while we're busy
+                await asyncio.sleep(0.01)
+
+            types = [event.type for event in received]
+            self.assertEqual(types[0], "hello")
+            self.assertEqual(types[-1], "message")
+            self.assertGreater(slack.rtm_stats.dropped, 0)
+            self.assertEqual(len(types) + slack.rtm_stats.dropped, len(events))
+            self.assertEqual(slack.rtm_stats.max_queued, 2)
+
+            with self.assertRaises(ValueError):
+                async for event in slack.rtm(buffer=2, overflow="explode"):
+                    pass
+
+        # closing with a full buffer drops a queued event to wake the consumer
+        events = [{"type": "hello"}] + [{"type": "message"} for _ in range(3)]
+        session.ws_connect.return_value = awaitable(websocket(*events))
+        slack = Slack(token="xoxb-foo")
+        received = []
+        async for event in slack.rtm(buffer=1):
+            received.append(event)
+            await asyncio.sleep(0.01)
+            if not slack.closed:
+                await slack.close(timeout=0.01)
+
+        self.assertEqual([event.type for event in received], ["hello"])
+        self.assertEqual(slack.rtm_stats.dropped, 1)
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_close(self, aiohttp):
+        events = [{"type": "hello"}, {"type": "message", "text": "hi"}]
+        session = rtm_session(aiohttp, *events)
 
+        slack = Slack(token="xoxb-foo")
+        received = []
+        async for event in slack.rtm(reconnect=True):
+            received.append(event)
+            self.assertEqual(slack.connections, 1)
+            await slack.close()
+
+        self.assertEqual([event.type for event in received], ["hello"])
+        self.assertEqual(slack.connections, 0)
+        self.assertTrue(slack.closed)
         session.close.assert_called_once()
+
+        with self.assertRaises(SlackError):
+            await slack.api("auth.test")
+
+    @patch("aioslack.core.backoff", return_value=60)
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_close_waiting(self, aiohttp, backoff):
+        class hang:
+            async def __aenter__(self):
+                await asyncio.Event().wait()
+
+            async def __aexit__(self, *args):
+                pass
+
+        session = MagicMock(name="session")
+        session.post.return_value = hang()
+        session.close.return_value = awaitable(None)
+        aiohttp.ClientSession.return_value = session
+
+        async def consume(slack):
+            return [event async for event in slack.rtm(reconnect=True)]
+
+        # closing ends a stream stuck in rtm.start without a CancelledError
+        slack = Slack(token="xoxb-foo")
+        consumer = asyncio.ensure_future(consume(slack))
+        await asyncio.sleep(0.01)
+        await slack.close(timeout=0.01)
+        self.assertEqual(await asyncio.wait_for(consumer, 1), [])
+
+        # and wakes a stream waiting to reconnect
+        session.post.return_value = response(RTM_START)
+        session.ws_connect.side_effect = ClientError("nope")
+
+        slack = Slack(token="xoxb-foo")
+        slack.warm = True
+        consumer = asyncio.ensure_future(consume(slack))
+        await asyncio.sleep(0.01)
+        backoff.assert_called_with(0)
+        start = time.monotonic()
+        await slack.close()
+        self.assertEqual(await asyncio.wait_for(consumer, 1), [])
+        self.assertLess(time.monotonic() - start, 1)
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_rtm_reconnect(self, aiohttp):
+        session = rtm_session(aiohttp)
+        session.ws_connect.side_effect = [
+            awaitable(websocket({"type": "hello"}, {"type": "goodbye"})),
+            awaitable(websocket({"type": "hello"}, {"type": "message"})),
+        ]
+
+        async with Slack(token="xoxb-foo") as slack:
+            start = time.monotonic()
+            types = []
+            async for event in slack.rtm(reconnect=True):
+                types.append(event.type)
+                if len(types) == 3:
+                    break
+
+            # reconnecting after goodbye doesn't wait on the tier 1 rate limit
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertEqual(slack.limiter.stats.delayed, 0)
+
+            self.assertEqual(types, ["hello", "hello", "message"])
+            self.assertEqual(slack.rtm_stats.connects, 2)
+            self.assertEqual(slack.rtm_stats.reconnects, 1)
+            session.post.assert_called_with(
+                "https://slack.com/api/rtm.connect", data={}
+            )
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_update(self, aiohttp):
+        aiohttp.ClientSession.return_value.close.return_value = awaitable(None)
+
+        async with Slack(token="xoxb-foo") as slack:
+
+            def event(data):
+                return Event.generate(data, recursive=False)
+
+            user = {"id": "U1", "team_id": "T1", "name": "jim"}
+            slack.update(event({"type": "team_join", "user": user}))
+            self.assertEqual(slack.users["U1"].name, "jim")
+
+            user = {"id": "U1", "team_id": "T1", "name": "james"}
+            slack.update(event({"type": "user_change", "user": user}))
+            self.assertEqual(slack.users["james"].id, "U1")
+            self.assertFalse("jim" in slack.users)
+
+            channel = {"id": "C1", "name": "general", "created": 1}
+            slack.update(event({"type": "channel_created", "channel": channel}))
+            self.assertIsInstance(slack.channels["C1"], Channel)
+
+            slack.channels["C1"] = Channel(id="C1", name="general", members=["U1"])
+            channel = {"id": "C1", "name": "random", "created": 1}
+            slack.update(event({"type": "channel_rename", "channel": channel}))
+            self.assertEqual(slack.channels["random"].members, ["U1"])
+
+            slack.update(event({"type": "channel_archive", "channel": "C1"}))
+            self.assertTrue(slack.channels["C1"].is_archived)
+            slack.update(event({"type": "channel_unarchive", "channel": "C1"}))
+            self.assertFalse(slack.channels["C1"].is_archived)
+
+            slack.update(event({"type": "channel_deleted", "channel": "C1"}))
+            self.assertFalse("C1" in slack.channels)
+
+            group = {"id": "G1", "name": "secret"}
+            slack.update(event({"type": "group_joined", "channel": group}))
+            self.assertEqual(slack.groups["secret"].id, "G1")
+            slack.update(event({"type": "group_left", "channel": "G1"}))
+            self.assertEqual(len(slack.groups), 0)
+
+            slack.update(event({"type": "message", "channel": "C1"}))
+
+            # malformed events are logged rather than raised into rtm()
+            with self.assertLogs("aioslack.core", "ERROR"):
+                slack.update(event({"type": "user_change", "user": {"id": "U9"}}))
+            self.assertFalse("U9" in slack.users)
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_snapshot(self, aiohttp):
+        aiohttp.ClientSession.return_value.close.return_value = awaitable(None)
+
+        slack = Slack(token="xoxb-foo")
+        slack.me = Auto.generate({"id": "U0", "name": "bot"}, "Me")
+        slack.channels["C1"] = Channel(id="C1", name="general", members=["U1"])
+        slack.channels["C2"] = Channel(id="C2", name="random", members=["U1", "U2"])
+        slack.channels["C3"] = Channel(id="C3", name="deleted")
+        slack.groups["G2"] = Group(id="G2", name="mpdm-jim--bob", is_mpim=True)
+        slack.index_members(slack.channels.values())
+        profile = Profile(display_name="Jimbo")
+        slack.users["U1"] = User(
+            id="U1", team_id="T1", name="jim", profile=profile, updated=10
+        )
+        slack.users["U2"] = User(id="U2", team_id="T1", name="bob", updated=10)
+
+        # changes made while the snapshot was on disk
+        users = {
+            "ok": True,
+            "members": [
+                {"id": "U1", "team_id": "T1", "name": "jim", "updated": 10},
+                {"id": "U2", "team_id": "T1", "name": "robert", "updated": 30},
+                {"id": "U3", "team_id": "T1", "name": "new", "updated": 30},
+            ],
+        }
+        conversations = {
+            "ok": True,
+            "channels": [
+                {"id": "C1", "name": "general", "is_channel": True, "num_members": 1},
+                {"id": "C2", "name": "random", "is_channel": True, "num_members": 3},
+                {"id": "G1", "name": "secret", "is_private": True, "num_members": 2},
+                {
+                    "id": "G2",
+                    "name": "mpdm-jim--bob",
+                    "is_private": True,
+                    "is_mpim": True,
+                },
+            ],
+        }
+        session = aiohttp.ClientSession.return_value
+
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshot.json.gz")
+            await slack.save(path)
+
+            # loading alone is warm, without any requests
+            restored = Slack(token="xoxb-foo")
+            self.assertTrue(await restored.load(path))
+            self.assertTrue(restored.warm)
+            session.post.assert_not_called()
+            self.assertEqual(restored.me.name, "bot")
+            self.assertEqual(restored.users["U1"], slack.users["U1"])
+            self.assertIs(restored.users.find("jimbo"), restored.users["U1"])
+            self.assertEqual(restored.channels["random"], slack.channels["C2"])
+            await restored.close()
+
+            # refreshing fetches changes in the background, for compact clients too
+            for compact in (False, True):
+                session.post.side_effect = [response(users), response(conversations)]
+                restored = Slack(token="xoxb-foo", compact=compact)
+                self.assertTrue(await restored.load(path, refresh=True))
+                self.assertTrue(restored.warm)
+                await asyncio.gather(*restored.tasks)
+                self.assertEqual(restored.users["U1"].name, "jim")
+                self.assertEqual(restored.users["U2"].name, "robert")
+                self.assertEqual(restored.users["U3"].name, "new")
+                self.assertEqual(restored.channels["general"].name, "general")
+                self.assertEqual(restored.groups["secret"].id, "G1")
+                self.assertTrue(restored.groups["G2"].is_mpim)
+                self.assertFalse("C3" in restored.channels)
+                # someone joined random while we were away, so its members are unknown
+                self.assertEqual(restored.channel_members.members("C1"), {"U1"})
+                self.assertFalse("C2" in restored.channel_members)
+                await restored.close()
+
+            session.post.side_effect = [response({"ok": False, "error": "fatal"})]
+            restored = Slack(token="xoxb-foo")
+            with self.assertLogs("aioslack.core", "WARNING"):
+                self.assertTrue(await restored.load(path, refresh=True))
+                await asyncio.gather(*restored.tasks)
+            self.assertTrue(restored.warm)
+
+            self.assertFalse(await restored.load(path, max_age=-1))
+            self.assertFalse(await restored.load(os.path.join(tmp, "missing")))
+            await restored.close()
+
+        await slack.close()
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_compact(self, aiohttp):
+        aiohttp.ClientSession.return_value.close.return_value = awaitable(None)
+
+        async with Slack(token="xoxb-foo", compact=True) as slack:
+
+            data = {"id": "C1", "name": "general", "topic": {"value": "hi"}}
+            event = Event.generate(
+                {"type": "channel_joined", "channel": data}, recursive=False
+            )
+            slack.update(event)
+            channel = slack.channels["general"]
+            self.assertFalse(hasattr(channel, "__dict__"))
+            self.assertNotIsInstance(channel, Channel)
+            self.assertEqual(channel.topic.value, "hi")
+
+            with self.assertRaises(ValueError):
+                slack.channels["C2"] = Channel(id="C2", name="random")
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_encode(self, aiohttp):
+        aiohttp.ClientSession.return_value.close.return_value = awaitable(None)
+
+        async with Slack(token="xoxb-foo") as slack:
+            slack.users["U1"] = User(id="U1", team_id="T1", name="jim")
+            slack.users["U2"] = User(id="U2", team_id="T1", name="bob", real_name="Bob")
+
+            self.assertEqual(
+                slack.encode("hi @Jim and @bob, @here @nobody"),
+                "hi <@U1> and <@U2>, <!here> @nobody",
+            )
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_decode(self, aiohttp):
+        aiohttp.ClientSession.return_value.close.return_value = awaitable(None)
+
+        async with Slack(token="xoxb-foo") as slack:
+            slack.users["U1"] = User(id="U1", team_id="T1", name="jim")
+            slack.channels["C1"] = Channel(id="C1", name="general")
+
+            self.assertEqual(slack.decode("plain text"), "plain text")
+            self.assertEqual(
+                slack.decode("<@U1> <@U2> <@U3|bob> <!here> <!foo>"),
+                "@jim @U2 @bob @here @foo",
+            )
+            self.assertEqual(slack.decode("<@U1>: hi", prefix=""), "jim: hi")
+            self.assertEqual(
+                slack.decode("see <#C1> and <#C2|random>, <#C3>"),
+                "see #general and #random, #C3",
+            )
+            self.assertEqual(
+                slack.decode("<!subteam^S1|@devs> <!subteam^S2> <!channel|@channel>"),
+                "@devs @S2 @channel",
+            )
+            self.assertEqual(
+                slack.decode("<!date^1392734382^{date}|Feb 18, 2014>"),
+                "Feb 18, 2014",
+            )
+            self.assertEqual(
+                slack.decode("<https://example.com|example> <https://example.com>"),
+                "example https://example.com",
+            )
+            self.assertEqual(
+                slack.decode("a &lt;b&gt; &amp;amp; <mailto:x@y.z|x@y.z>"),
+                "a <b> &amp; x@y.z",
+            )
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_usergroups(self, aiohttp):
+        responses = []
+        for value in (
+            {
+                "ok": True,
+                "usergroups": [
+                    {"id": "S1", "handle": "devs", "name": "Devs", "users": ["U1"]},
+                    {"id": "S2", "handle": "ops", "name": "Ops"},
+                ],
+            },
+            {"ok": True, "users": ["U1", "U2"]},
+        ):
+            response = MagicMock(name="response")
+            response.status = 200
+            response.read.return_value = awaitable(dumps(value))
+            responses.append(awaitable(response))
+
+        session = MagicMock(name="session")
+        session.post.side_effect = responses
+        session.close.return_value = awaitable(None)
+
+        aiohttp.ClientSession.return_value = session
+
+        async with Slack(token="xoxb-foo") as slack:
+            await slack.fetch_usergroups()
+            session.post.assert_called_with(
+                "https://slack.com/api/usergroups.users.list", data={"usergroup": "S2"}
+            )
+            self.assertIsInstance(slack.usergroups["S1"], UserGroup)
+            self.assertEqual(slack.usergroups["S2"].users, ["U1", "U2"])
+            members = slack.usergroup_members
+            self.assertEqual(members.groups("U1"), {"S1", "S2"})
+            self.assertTrue(members.is_member("S2", "U2"))
+            self.assertFalse(members.is_member("S1", "U2"))
+
+            self.assertEqual(
+                slack.decode("<!subteam^S1|@old> <!subteam^S9>"), "@devs @S9"
+            )
+            self.assertEqual(slack.encode("hi @Ops"), "hi <!subteam^S2|@ops>")
+
+            def event(data):
+                return Event.generate(data, recursive=False)
+
+            slack.update(
+                event(
+                    {
+                        "type": "subteam_members_changed",
+                        "subteam_id": "S1",
+                        "added_users": ["U3"],
+                        "removed_users": ["U1"],
+                    }
+                )
+            )
+            self.assertEqual(members.members("S1"), {"U3"})
+            self.assertEqual(members.groups("U1"), {"S2"})
+            self.assertEqual(slack.usergroups["S1"].users, ["U3"])
+
+            # groups without a known member list aren't indexed from changes
+            slack.update(
+                event(
+                    {
+                        "type": "subteam_members_changed",
+                        "subteam_id": "S9",
+                        "added_users": ["U1"],
+                    }
+                )
+            )
+            self.assertFalse("S9" in members)
+            self.assertEqual(members.groups("U1"), {"S2"})
+
+            subteam = {"id": "S1", "handle": "developers", "name": "Devs"}
+            slack.update(event({"type": "subteam_updated", "subteam": subteam}))
+            self.assertEqual(slack.usergroups["S1"].handle, "developers")
+            self.assertEqual(slack.usergroups["S1"].users, ["U3"])
+            self.assertEqual(slack.usergroups.find("developers").id, "S1")
+
+            subteam = {"id": "S3", "handle": "qa", "users": ["U2"]}
+            slack.update(event({"type": "subteam_created", "subteam": subteam}))
+            self.assertEqual(members.groups("U2"), {"S2", "S3"})
+
+            subteam = {"id": "S2", "handle": "ops", "date_delete": 1}
+            slack.update(event({"type": "subteam_updated", "subteam": subteam}))
+            self.assertFalse("S2" in slack.usergroups)
+            self.assertEqual(members.groups("U2"), {"S3"})
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_channel_members(self, aiohttp):
+        aiohttp.ClientSession.return_value.close.return_value = awaitable(None)
+
+        async with Slack(token="xoxb-foo") as slack:
+
+            def event(data):
+                return Event.generate(data, recursive=False)
+
+            members = slack.channel_members
+            channel = {"id": "C1", "name": "general", "members": ["U1", "U2"]}
+            slack.update(event({"type": "channel_joined", "channel": channel}))
+            group = {"id": "G1", "name": "secret", "members": ["U2"]}
+            slack.update(event({"type": "group_joined", "channel": group}))
+            self.assertTrue(members.is_member("C1", "U1"))
+            self.assertEqual(members.groups("U2"), {"C1", "G1"})
+
+            for kind, user in (
+                ("member_joined_channel", "U3"),
+                ("member_left_channel", "U1"),
+            ):
+                slack.update(event({"type": kind, "channel": "C1", "user": user}))
+            self.assertEqual(members.members("C1"), {"U2", "U3"})
+            self.assertEqual(members.groups("U1"), set())
+            self.assertEqual(
+                slack.dump_channel(slack.channels["C1"])["members"], ["U2", "U3"]
+            )
+
+            channel = {"id": "C1", "name": "random"}
+            slack.update(event({"type": "channel_rename", "channel": channel}))
+            self.assertEqual(members.members("C1"), {"U2", "U3"})
+
+            slack.update(event({"type": "group_left", "channel": "G1"}))
+            self.assertEqual(members.groups("U2"), {"C1"})
+
+            # once we've left a channel its member list can't be kept current
+            slack.update(event({"type": "channel_left", "channel": "C1"}))
+            self.assertFalse("C1" in members)
+            self.assertEqual(members.groups("U2"), set())
+            self.assertFalse(slack.channels["C1"].is_member)
+
+            slack.index_members([Channel(id="C2", name="new", members=["U1"])])
+            self.assertEqual(members.groups("U1"), {"C2"})
+
+            # joins and leaves don't make a member list for unindexed channels
+            slack.channels["C3"] = Channel(id="C3", name="other", members=["U4"])
+            for kind, user in (
+                ("member_joined_channel", "U1"),
+                ("member_left_channel", "U4"),
+            ):
+                slack.update(event({"type": kind, "channel": "C3", "user": user}))
+            self.assertFalse("C3" in members)
+            self.assertEqual(members.groups("U1"), {"C2"})
+            self.assertEqual(slack.dump_channel(slack.channels["C3"])["members"], [])
+
+    @patch("aioslack.core.aiohttp")
+    @async_test
+    async def test_send(self, aiohttp):
+        response = MagicMock(name="response")
+        response.status = 200
+        response.read.return_value = awaitable(dumps({"ok": True, "ts": "1.0"}))
+
+        session = MagicMock(name="session")
+        session.post.return_value = awaitable(response)
+        session.close.return_value = awaitable(None)
+
+        aiohttp.ClientSession.return_value = session
+
+        async with Slack(token="xoxb-foo") as slack:
+            slack.sender.interval = 0.01
+            slack.users["U1"] = User(id="U1", team_id="T1", name="jim")
+            value = await slack.send("C1", "hi @jim")
+            self.assertEqual(value.ts, "1.0")
+            session.post.assert_called_with(
+                "https://slack.com/api/chat.postMessage",
+                data={"channel": "C1", "text": "hi <@U1>"},
+            )
+
+            # queued messages are still posted when closing
+            pending = asyncio.ensure_future(slack.send("C1", "bye"))
+            await asyncio.sleep(0)
+
+        self.assertEqual((await pending).ts, "1.0")
+        self.assertEqual(session.post.call_count, 2)
+        with self.assertRaises(SlackError):
+            await slack.send("C1", "hello?")
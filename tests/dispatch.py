@@ -0,0 +1,133 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import asyncio
+from unittest import TestCase
+
+from aioslack.dispatch import Dispatcher
+from aioslack.types import LazyEvent
+from .base import async_test
+
+
+class DispatchTest(TestCase):
+    @async_test
+    async def test_dispatch(self):
+        dispatcher = Dispatcher()
+        seen = []
+
+        @dispatcher.on("message")
+        async def message(event):
+            seen.append(("message", event.text))
+
+        @dispatcher.on("message", "bot_message")
+        async def bot(event):
+            seen.append(("bot", event.text))
+
+        @dispatcher.on("*")
+        async def everything(event):
+            seen.append(("*", event.type))
+
+        @dispatcher.on("reaction_added")
+        @dispatcher.on("reaction_removed")
+        async def broken(event):
+            raise ValueError("oops")
+
+        self.assertIsNone(dispatcher.types())
+
+        await dispatcher.dispatch(LazyEvent({"type": "message", "text": "a"}))
+        await dispatcher.dispatch(
+            LazyEvent({"type": "message", "subtype": "bot_message", "text": "b"})
+        )
+        await dispatcher.dispatch(LazyEvent({"type": "reaction_added"}))
+        await dispatcher.dispatch(LazyEvent({"type": "reaction_removed"}))
+        await dispatcher.stop()
+
+        self.assertEqual(
+            sorted(seen),
+            [
+                ("*", "message"),
+                ("*", "message"),
+                ("*", "reaction_added"),
+                ("*", "reaction_removed"),
+                ("bot", "b"),
+                ("message", "a"),
+                ("message", "b"),
+            ],
+        )
+        stats = dispatcher.stats
+        self.assertEqual(
+            stats["message/bot_message:DispatchTest.test_dispatch.<locals>.bot"].calls,
+            1,
+        )
+        # the same handler registered for two types keeps separate stats
+        broken = [name for name in stats if name.endswith("broken")]
+        self.assertEqual(
+            sorted(broken),
+            [
+                "reaction_added:DispatchTest.test_dispatch.<locals>.broken",
+                "reaction_removed:DispatchTest.test_dispatch.<locals>.broken",
+            ],
+        )
+        for name in broken:
+            self.assertEqual((stats[name].calls, stats[name].errors), (1, 1))
+
+    @async_test
+    async def test_overflow(self):
+        dispatcher = Dispatcher()
+        blocked = asyncio.Event()
+        seen = []
+
+        @dispatcher.on("message", backlog=2)
+        async def stuck(event):
+            await blocked.wait()
+
+        @dispatcher.on("message")
+        async def message(event):
+            seen.append(event.ts)
+
+        # a full backlog drops events rather than holding up other handlers
+        for ts in range(5):
+            event = LazyEvent({"type": "message", "ts": str(ts)})
+            await asyncio.wait_for(dispatcher.dispatch(event), 1)
+            await asyncio.sleep(0)
+        blocked.set()
+        await dispatcher.stop()
+
+        self.assertEqual(seen, ["0", "1", "2", "3", "4"])
+        stats = dispatcher.stats
+        stuck_stats = stats["message:DispatchTest.test_overflow.<locals>.stuck"]
+        self.assertEqual((stuck_stats.calls, stuck_stats.dropped), (3, 2))
+
+        with self.assertRaises(ValueError):
+            dispatcher.on("message", overflow="explode")(message)
+
+    @async_test
+    async def test_concurrency(self):
+        dispatcher = Dispatcher()
+        running = []
+        peak = []
+        order = {}
+
+        @dispatcher.on("message", concurrency=3, ordered=True, overflow="block")
+        async def handler(event):
+            running.append(event)
+            peak.append(len(running))
+            await asyncio.sleep(0.001 * (3 - int(event.ts)))
+            order.setdefault(event.channel, []).append(event.ts)
+            running.remove(event)
+
+        self.assertEqual(dispatcher.types(), {"message"})
+
+        channels = [f"C{idx}" for idx in range(12)]
+        for ts in range(3):
+            for channel in channels:
+                event = {"type": "message", "channel": channel, "ts": str(ts)}
+                await dispatcher.dispatch(LazyEvent(event))
+        await dispatcher.stop()
+
+        self.assertLessEqual(max(peak), 3)
+        self.assertGreater(max(peak), 1)
+        for channel in channels:
+            self.assertEqual(order[channel], ["0", "1", "2"])
+        stats = list(dispatcher.stats.values())[0]
+        self.assertEqual((stats.calls, stats.queued), (36, 0))
@@ -0,0 +1,97 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import time
+from json import dumps, loads
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from aioslack.events import Receiver, sign, verify
+from aioslack.types import EventWrapper, LazyEvent
+from .base import async_test, awaitable
+
+
+def request(secret, data, *, timestamp=None, signature=None, retry=False):
+    body = dumps(data).encode()
+    timestamp = str(int(time.time())) if timestamp is None else timestamp
+    headers = {
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": signature or sign(secret, timestamp, body),
+    }
+    if retry:
+        headers["X-Slack-Retry-Num"] = "1"
+
+    mock = MagicMock(name="request")
+    mock.headers = headers
+    mock.read.return_value = awaitable(body)
+    return mock
+
+
+class EventsTest(TestCase):
+    def test_verify(self):
+        body = b'{"type":"event_callback"}'
+        signature = sign("secret", "1531420618", body)
+        self.assertTrue(signature.startswith("v0="))
+        self.assertTrue(verify("secret", "1531420618", body, signature, 1531420700))
+        self.assertFalse(verify("other", "1531420618", body, signature, 1531420700))
+        self.assertFalse(verify("secret", "1531420618", b"{}", signature, 1531420700))
+        self.assertFalse(verify("secret", "1531420618", body, signature, 1531429999))
+        self.assertFalse(verify("secret", "soon", body, signature, 1531420700))
+
+    @async_test
+    async def test_receiver(self):
+        receiver = Receiver("secret", backlog=2)
+        event = {
+            "type": "event_callback",
+            "team_id": "T1",
+            "event_id": "Ev1",
+            "event": {"type": "message", "text": "hi", "channel": "C1"},
+        }
+
+        response = await receiver.handle(request("secret", event))
+        self.assertEqual(response.status, 200)
+        response = await receiver.handle(request("secret", event, retry=True))
+        self.assertEqual(response.status, 200)
+
+        response = await receiver.handle(request("secret", event, signature="v0=x"))
+        self.assertEqual(response.status, 401)
+        stale = str(int(time.time()) - 3600)
+        response = await receiver.handle(request("secret", event, timestamp=stale))
+        self.assertEqual(response.status, 401)
+
+        challenge = {"type": "url_verification", "challenge": "abc"}
+        response = await receiver.handle(request("secret", challenge))
+        self.assertEqual(loads(response.text), {"challenge": "abc"})
+
+        await receiver.handle(request("secret", {**event, "event_id": "Ev2"}))
+        response = await receiver.handle(
+            request("secret", {**event, "event_id": "Ev3"})
+        )
+        self.assertEqual(response.status, 503)
+
+        stats = receiver.stats
+        self.assertEqual(stats.received, 7)
+        self.assertEqual(stats.accepted, 2)
+        self.assertEqual(stats.duplicates, 1)
+        self.assertEqual(stats.retries, 1)
+        self.assertEqual(stats.rejected, 2)
+        self.assertEqual(stats.dropped, 1)
+
+        wrappers = []
+        async for wrapper in receiver.events():
+            wrappers.append(wrapper)
+            if len(wrappers) == 2:
+                break
+        self.assertIsInstance(wrappers[0], EventWrapper)
+        self.assertEqual([w.event_id for w in wrappers], ["Ev1", "Ev2"])
+        self.assertEqual(wrappers[0].team_id, "T1")
+        self.assertIsInstance(wrappers[0].event, LazyEvent)
+        self.assertEqual(wrappers[0].event.type, "message")
+        self.assertEqual(wrappers[0].event.text, "hi")
+        self.assertEqual(receiver.stats.processed, 2)
+
+        # retried deliveries that were dropped can be accepted later
+        response = await receiver.handle(
+            request("secret", {**event, "event_id": "Ev3"})
+        )
+        self.assertEqual(response.status, 200)
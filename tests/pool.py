@@ -0,0 +1,68 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+from json import dumps
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from aioslack.pool import SlackPool
+from .base import async_test, awaitable
+
+
+class PoolTest(TestCase):
+    @patch("aioslack.core.aiohttp")
+    @patch("aioslack.pool.aiohttp")
+    @async_test
+    async def test_pool(self, aiohttp, core_aiohttp):
+        response = MagicMock(name="response")
+        response.status = 200
+        response.read.return_value = awaitable(dumps({"ok": True}))
+
+        session = MagicMock(name="session")
+        session.post.return_value = awaitable(response)
+        session.close.return_value = awaitable(None)
+
+        aiohttp.ClientSession.return_value = session
+
+        async with SlackPool(limit=10, retries=1) as pool:
+            foo = pool.add("xoxb-foo")
+            bar = pool.add("xoxb-bar", retries=2)
+            self.assertIs(pool.add("xoxb-foo"), foo)
+            self.assertEqual(len(pool), 2)
+            self.assertEqual(list(pool), ["xoxb-foo", "xoxb-bar"])
+            self.assertEqual((foo.retries, bar.retries), (1, 2))
+            self.assertIs(foo.session, bar.session)
+
+            await foo.api("auth.test")
+            session.post.assert_called_with(
+                "https://slack.com/api/auth.test",
+                data={},
+                headers={"Authorization": "Bearer xoxb-foo"},
+            )
+            await bar.api("auth.test")
+            await bar.api("auth.test")
+            session.post.assert_called_with(
+                "https://slack.com/api/auth.test",
+                data={},
+                headers={"Authorization": "Bearer xoxb-bar"},
+            )
+
+            stats = pool.stats
+            self.assertEqual(stats["xoxb-foo"].requests, 1)
+            self.assertEqual(stats["xoxb-bar"].requests, 2)
+
+            # closing one client leaves the shared session open
+            await pool.remove("xoxb-bar")
+            self.assertTrue(bar.closed)
+            self.assertNotIn("xoxb-bar", pool)
+            session.close.assert_not_called()
+
+        self.assertTrue(foo.closed)
+        session.close.assert_called_once()
+        core_aiohttp.ClientSession.assert_not_called()
+        aiohttp.TCPConnector.assert_called_with(
+            limit=10, keepalive_timeout=30.0, ttl_dns_cache=300
+        )
+        aiohttp.ClientSession.assert_called_with(
+            connector=aiohttp.TCPConnector.return_value
+        )
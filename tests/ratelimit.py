@@ -0,0 +1,51 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+from unittest import TestCase
+
+from aioslack.ratelimit import Limiter, TIERS, idempotent
+from .base import async_test
+
+
+class RateLimitTest(TestCase):
+    def test_idempotent(self):
+        self.assertTrue(idempotent("users.info"))
+        self.assertTrue(idempotent("conversations.list"))
+        self.assertTrue(idempotent("users.lookupByEmail"))
+        self.assertTrue(idempotent("auth.test"))
+        self.assertFalse(idempotent("chat.postMessage"))
+        self.assertFalse(idempotent("reactions.add"))
+
+    @async_test
+    async def test_limiter(self):
+        limiter = Limiter(tiers={1: 600, 3: 60}, methods={"fast.info": 1})
+
+        bucket = limiter.bucket("fast.info")
+        self.assertIs(limiter.bucket("slow.info"), limiter.buckets[3])
+
+        bucket.tokens = 0
+        await limiter.acquire("fast.info")
+        self.assertEqual(limiter.stats.requests, 1)
+        self.assertEqual(limiter.stats.delayed, 1)
+        self.assertGreater(limiter.stats.wait_time, 0)
+        self.assertEqual(limiter.stats.queued, 0)
+
+        limiter.throttle("fast.info", 0.05)
+        self.assertEqual(limiter.stats.throttled, 1)
+        self.assertGreater(bucket.delay(), 0.04)
+        await limiter.acquire("fast.info")
+        self.assertLessEqual(bucket.delay(), 0.1)
+
+    def test_default_tiers(self):
+        limiter = Limiter()
+
+        # a few quick rtm reconnects fit in the tier 1 burst allowance
+        for _ in range(3):
+            self.assertEqual(limiter.bucket("rtm.connect").delay(), 0)
+            limiter.bucket("rtm.connect").take()
+        self.assertEqual(limiter.bucket("rtm.start").delay(), 0)
+
+        # posts are paced per channel by Sender, not by a shared tier
+        bucket = limiter.bucket("chat.postMessage")
+        self.assertIsNot(bucket, limiter.buckets[4])
+        self.assertGreater(bucket.capacity, TIERS[4])
@@ -0,0 +1,81 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import asyncio
+import time
+from unittest import TestCase
+
+from aioslack.sender import Sender
+from .base import async_test
+
+
+class SenderTest(TestCase):
+    @async_test
+    async def test_sender(self):
+        posts = []
+
+        async def api(method, **kwargs):
+            posts.append((time.monotonic(), kwargs))
+            await asyncio.sleep(0)
+            if kwargs["text"] == "FAIL":
+                raise ValueError("oops")
+            return {"ok": True, "ts": str(len(posts))}
+
+        sender = Sender(api, encode=str.upper, interval=0.05)
+        futures = [
+            sender.send("C1", "one"),
+            sender.send("C1", "two"),
+            sender.send("C2", "hello", thread_ts="1.0"),
+            sender.send("C1", "three", coalesce=False),
+            sender.send("C1", "four", as_user="true"),
+            sender.send("C1", "five", as_user="true"),
+        ]
+        self.assertEqual(sender.backlog, {"C1": 5, "C2": 1})
+        results = await asyncio.gather(*futures)
+
+        by_channel = {}
+        for ts, kwargs in posts:
+            by_channel.setdefault(kwargs.pop("channel"), []).append((ts, kwargs))
+        self.assertEqual(
+            [kwargs for _, kwargs in by_channel["C1"]],
+            [
+                {"text": "ONE\nTWO"},
+                {"text": "THREE"},
+                {"text": "FOUR\nFIVE", "as_user": "true"},
+            ],
+        )
+        self.assertEqual(
+            by_channel["C2"],
+            [(by_channel["C2"][0][0], {"text": "HELLO", "thread_ts": "1.0"})],
+        )
+
+        # channels run in parallel, but each posts at most once per interval
+        self.assertLess(by_channel["C2"][0][0], by_channel["C1"][1][0])
+        times = [ts for ts, _ in by_channel["C1"]]
+        for before, after in zip(times, times[1:]):
+            self.assertGreaterEqual(after - before, 0.045)
+
+        self.assertIs(results[0], results[1])
+        self.assertIs(results[4], results[5])
+        stats = sender.stats
+        self.assertEqual((stats.messages, stats.posts, stats.coalesced), (6, 4, 2))
+        self.assertEqual((stats.queued, stats.max_queued), (0, 6))
+        self.assertEqual(sender.backlog, {})
+
+        with self.assertRaises(ValueError):
+            await sender.send("C1", "fail")
+        self.assertEqual(stats.errors, 1)
+
+    @async_test
+    async def test_sender_stop(self):
+        async def api(method, **kwargs):
+            return {"ok": True}
+
+        sender = Sender(api, interval=10)
+        first = sender.send("C1", "one", coalesce=False)
+        second = sender.send("C1", "two")
+        await first
+        await sender.stop(timeout=0.01)
+        self.assertTrue(second.cancelled())
+        self.assertEqual(sender.stats.queued, 0)
+        self.assertEqual(sender.workers, {})
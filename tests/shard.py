@@ -0,0 +1,118 @@
+# Copyright 2018 John Reese
+# Licensed under the MIT license
+
+import queue
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from aioslack.shard import Supervisor, ingest, shard
+from aioslack.types import LazyEvent
+from .base import RTM_START, async_test, awaitable, response, rtm_session, websocket
+
+
+def crash(*args):
+    raise SystemExit(3)
+
+
+class ShardTest(TestCase):
+    def test_shard(self):
+        tokens = [f"xoxb-{idx}" for idx in range(5)]
+        self.assertEqual(
+            shard(tokens, 2),
+            [["xoxb-0", "xoxb-2", "xoxb-4"], ["xoxb-1", "xoxb-3"]],
+        )
+        self.assertEqual(shard(tokens[:2], 4), [["xoxb-0"], ["xoxb-1"]])
+
+    @patch("aioslack.pool.aiohttp")
+    @async_test
+    async def test_ingest(self, aiohttp):
+        events = [{"type": "hello"}, {"type": "message", "text": "hi"}]
+        invalid = {"ok": False, "error": "invalid_auth"}
+
+        def post(url, data, headers):
+            if headers["Authorization"] == "Bearer xoxb-bad":
+                return response(invalid)
+            return response(RTM_START)
+
+        session = rtm_session(aiohttp)
+        session.post.side_effect = post
+        session.ws_connect.side_effect = lambda *args, **kwargs: awaitable(
+            websocket(*events)
+        )
+
+        # a token failing with invalid_auth doesn't stop the rest of the shard
+        forwarded = queue.Queue()
+        counter = MagicMock(value=0)
+        dropped = MagicMock(value=0)
+        tokens = ["xoxb-foo", "xoxb-bad", "xoxb-bar"]
+        with self.assertLogs("aioslack.shard", "ERROR"):
+            await ingest(tokens, forwarded, counter, dropped, None, {}, {})
+
+        self.assertEqual(counter.value, 4)
+        items = [forwarded.get_nowait() for _ in range(4)]
+        self.assertEqual(
+            sorted(items),
+            [
+                ("xoxb-bar", '{"type":"hello"}'),
+                ("xoxb-bar", '{"type":"message","text":"hi"}'),
+                ("xoxb-foo", '{"type":"hello"}'),
+                ("xoxb-foo", '{"type":"message","text":"hi"}'),
+            ],
+        )
+
+        # a full queue drops events instead of blocking the worker
+        full = queue.Queue(maxsize=3)
+        await ingest(["xoxb-foo", "xoxb-bar"], full, counter, dropped, None, {}, {})
+        self.assertEqual(full.qsize(), 3)
+        self.assertEqual(dropped.value, 1)
+
+        handled = []
+        await ingest(
+            ["xoxb-foo"],
+            forwarded,
+            counter,
+            dropped,
+            lambda token, event: handled.append((token, event.type)),
+            {},
+            {},
+        )
+        self.assertEqual(handled, [("xoxb-foo", "hello"), ("xoxb-foo", "message")])
+        self.assertTrue(forwarded.empty())
+
+    @patch("aioslack.shard.backoff", lambda attempt: 0.0)
+    @patch("aioslack.shard.work", crash)
+    @async_test
+    async def test_supervisor(self):
+        supervisor = Supervisor(
+            ["xoxb-a", "xoxb-b", "xoxb-c"], workers=2, max_restarts=1
+        )
+        self.assertEqual(len(supervisor.shards), 2)
+        supervisor.start()
+        try:
+            for process in supervisor.processes:
+                process.join(5)
+                self.assertEqual(process.exitcode, 3)
+
+            supervisor.check()
+            stats = supervisor.stats
+            self.assertEqual([s.restarts for s in stats], [1, 1])
+            self.assertEqual([s.failures for s in stats], [1, 1])
+            self.assertEqual([s.tokens for s in stats], [2, 1])
+
+            # workers that keep crashing are eventually given up on
+            for process in supervisor.processes:
+                process.join(5)
+            with self.assertLogs("aioslack.shard", "ERROR"):
+                supervisor.check()
+            self.assertEqual(supervisor.processes, [None, None])
+            self.assertEqual([s.restarts for s in supervisor.stats], [1, 1])
+
+            supervisor.events_queue.put(("xoxb-a", '{"type":"hello"}'))
+            async for token, event in supervisor.events():
+                self.assertEqual(token, "xoxb-a")
+                self.assertEqual(event, LazyEvent({"type": "hello"}))
+                break
+        finally:
+            await supervisor.stop()
+
+        self.assertEqual(supervisor.processes, [None, None])
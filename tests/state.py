@@ -1,10 +1,12 @@
 # Copyright 2018 John Reese
 # Licensed under the MIT license
 
+import asyncio
 from unittest import TestCase
 from unittest.mock import MagicMock, patch, PropertyMock
 
-from aioslack.state import Cache
+from aioslack.state import Cache, Membership, ResponseCache, user_aliases
+from aioslack.types import Profile, User
 from .base import async_test, awaitable
 
 
@@ -24,3 +26,174 @@ class StateTest(TestCase):
             cache["bar"] = "baz"
 
         self.assertFalse("bar" in cache)
+
+    def test_cache_names(self):
+        cache = Cache(User, aliases=user_aliases)
+        profile = Profile(display_name="Jimbo", real_name_normalized="James Smith")
+        user = User(id="U1", team_id="T1", name="jim", profile=profile)
+
+        cache["U1"] = user
+        self.assertIs(cache.find("jim"), user)
+        self.assertIs(cache.find("JIMBO"), user)
+        self.assertIs(cache.find("jamessmith"), user)
+        self.assertIsNone(cache.find("bob"))
+
+        renamed = User(id="U1", team_id="T1", name="james", profile=profile)
+        cache["U1"] = renamed
+        self.assertIs(cache.find("james"), renamed)
+        self.assertIs(cache["james"], renamed)
+        self.assertIsNone(cache.find("jim"))
+        self.assertFalse("jim" in cache)
+
+        # primary names win over another user's alias
+        other = User(id="U2", team_id="T1", name="jimbo")
+        cache["U2"] = other
+        self.assertIs(cache.find("jimbo"), other)
+
+        del cache["U1"]
+        self.assertIsNone(cache.find("james"))
+        self.assertFalse("james" in cache)
+        self.assertIs(cache.find("jimbo"), other)
+
+        # and the alias goes back to its other owner once the name is gone
+        del cache["U2"]
+        cache["U1"] = user
+        cache["U2"] = other
+        self.assertIs(cache.find("jimbo"), other)
+        del cache["U2"]
+        self.assertIs(cache.find("jimbo"), user)
+        del cache["U1"]
+        self.assertIsNone(cache.find("jimbo"))
+        self.assertEqual(cache.owners, {})
+
+    def test_cache_eviction(self):
+        cache = Cache(dict, maxsize=2)
+        cache["a"] = {"id": "a", "name": "alpha"}
+        cache["b"] = {"id": "b", "name": "beta"}
+        cache["a"]  # a is now the most recently used
+        cache["c"] = {"id": "c", "name": "gamma"}
+
+        self.assertEqual(list(cache), ["a", "c"])
+        self.assertFalse("b" in cache)
+        self.assertFalse("beta" in cache)
+        self.assertIsNone(cache.find("beta"))
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertEqual(cache.stats.hits, 1)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats.misses, 2)
+
+        del cache["a"]
+        self.assertFalse("alpha" in cache)
+        self.assertEqual(cache.by_name, {"gamma": "c"})
+
+    def test_cache_ttl(self):
+        cache = Cache(dict, ttl=60)
+        cache["a"] = {"id": "a", "name": "alpha"}
+        cache["b"] = {"id": "b", "name": "beta"}
+        self.assertEqual(cache["alpha"], {"id": "a", "name": "alpha"})
+
+        cache.expires["a"] -= 120
+        self.assertFalse("alpha" in cache)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats.expirations, 1)
+        self.assertEqual(cache.by_name, {"beta": "b"})
+
+        cache.expires["b"] -= 120
+        cache.purge()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats.expirations, 2)
+
+    @async_test
+    async def test_cache_fetch(self):
+        calls = []
+
+        async def api(method, **kwargs):
+            calls.append((method, kwargs))
+            await asyncio.sleep(0)
+            if kwargs["user"] == "U404":
+                raise KeyError("user_not_found")
+            return {"user": {"id": kwargs["user"], "team_id": "T1", "name": "jim"}}
+
+        cache = Cache(User, "users.info", api=api)
+        users = await asyncio.gather(cache.fetch("U1"), cache.fetch("U1"))
+        self.assertIs(users[0], users[1])
+        self.assertIs(cache["U1"], users[0])
+        self.assertEqual(calls, [("users.info", {"user": "U1"})])
+        self.assertEqual(cache.inflight, {})
+
+        await cache.fetch("U1")
+        self.assertEqual(len(calls), 1)
+
+        await cache.prefetch(["U1", "U2", "U3", "U404"])
+        self.assertEqual(len(calls), 4)
+        self.assertTrue("U2" in cache)
+        self.assertTrue("U3" in cache)
+        self.assertFalse("U404" in cache)
+
+        with self.assertRaises(KeyError):
+            await Cache(User).fetch("U1")
+
+    @async_test
+    async def test_response_cache(self):
+        calls = []
+
+        async def request():
+            calls.append(1)
+            await asyncio.sleep(0)
+            if len(calls) == 2:
+                raise ValueError("boom")
+            return len(calls)
+
+        cache = ResponseCache({"users.info": 60, "team.info": 0}, maxsize=2)
+        self.assertTrue("users.info" in cache)
+        self.assertFalse("chat.postMessage" in cache)
+
+        results = await asyncio.gather(
+            *(cache.get("users.info", {"user": "U1"}, request) for _ in range(3))
+        )
+        self.assertEqual(results, [1, 1, 1])
+        self.assertEqual(await cache.get("users.info", {"user": "U1"}, request), 1)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.stats.hits, cache.stats.coalesced), (1, 2))
+
+        # failures aren't cached, and zero ttls expire immediately
+        with self.assertRaises(ValueError):
+            await cache.get("users.info", {"user": "U2"}, request)
+        self.assertEqual(await cache.get("users.info", {"user": "U2"}, request), 3)
+        self.assertEqual(await cache.get("team.info", {}, request), 4)
+        self.assertEqual(await cache.get("team.info", {}, request), 5)
+        self.assertEqual(cache.stats.expirations, 1)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.inflight, {})
+
+        cache.invalidate("users.info")
+        self.assertEqual(len(cache), 1)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_membership(self):
+        members = Membership()
+        members.set("S1", ["U1", "U2"])
+        members.add("S2", "U2")
+        self.assertEqual(len(members), 2)
+        self.assertTrue("S1" in members)
+        self.assertTrue(members.is_member("S1", "U1"))
+        self.assertFalse(members.is_member("S2", "U1"))
+        self.assertFalse(members.is_member("S3", "U1"))
+        self.assertEqual(members.groups("U2"), {"S1", "S2"})
+
+        members.set("S1", ["U3"])
+        self.assertEqual(members.members("S1"), {"U3"})
+        self.assertEqual(members.groups("U1"), set())
+        self.assertEqual(members.groups("U2"), {"S2"})
+
+        members.discard("S2", "U2")
+        members.discard("S9", "U9")
+        self.assertEqual(members.by_member, {"U3": {"S1"}})
+
+        members.remove("S1")
+        members.remove("S9")
+        self.assertEqual(members.by_member, {})
+        self.assertEqual(members.members("S1"), set())
@@ -6,7 +6,17 @@ from unittest import TestCase
 from unittest.mock import MagicMock, patch, PropertyMock
 
 from attr import dataclass
-from aioslack.types import Auto, Value
+from aioslack.types import (
+    Auto,
+    ClassCache,
+    Event,
+    Generic,
+    LazyEvent,
+    Profile,
+    User,
+    Value,
+    compact,
+)
 from .base import async_test, awaitable
 
 
@@ -39,6 +49,21 @@ class TypesTest(TestCase):
         self.assertIsInstance(fizz.buzz, Auto)
         self.assertEqual(fizz.buzz.foo, "bar")
 
+    def test_auto_build_compiled(self):
+        @dataclass
+        class Foo(Auto):
+            fizz: int
+            extra: Generic = {}
+            value: Value = Value()
+
+        data = {"fizz": 1, "extra": {"a": 1}, "value": {"value": "v"}, "bar": 2}
+        foo = Foo.build(data)
+        self.assertEqual(foo.fizz, 1)
+        self.assertEqual(foo.extra, {"a": 1})
+        self.assertEqual(foo.value, Value(value="v"))
+        self.assertIn("_builder", Foo.__dict__)
+        self.assertEqual(Foo.build({"fizz": 2}), Foo(fizz=2))
+
     def test_auto_generate(self):
         data = {"foo": "bar", "fizz": "buzz"}
         obj = Auto.generate(data)
@@ -68,9 +93,93 @@ class TypesTest(TestCase):
         self.assertIsInstance(obj.fizz, Mapping)
         self.assertEqual(obj.fizz, data["fizz"])
 
+    def test_auto_mapping(self):
+        @dataclass
+        class Foo(Auto):
+            fizz: int
+            buzz: Value = Value()
+
+        foo = Foo(fizz=1, buzz=Value(value="bar"))
+        self.assertTrue("fizz" in foo)
+        self.assertTrue("buzz" in foo)
+        self.assertFalse("bar" in foo)
+        self.assertEqual(foo["fizz"], 1)
+        self.assertIs(foo["buzz"], foo.buzz)
+        self.assertEqual(Foo.field_names(), frozenset(["fizz", "buzz"]))
+
+        with self.assertRaises(KeyError):
+            foo["bar"]
+
+        obj = Auto.generate({"foo": "bar"})
+        self.assertTrue("foo" in obj)
+        self.assertEqual(obj["foo"], "bar")
+        self.assertFalse("foo" in Auto())
+
+    def test_lazy_event(self):
+        data = {"type": "message", "text": "hi", "item": {"ts": "1.0"}}
+        event = LazyEvent(data)
+
+        self.assertIsInstance(event, Event)
+        self.assertEqual(event.type, "message")
+        self.assertNotIn("text", event.__dict__)
+        self.assertEqual(event.text, "hi")
+        self.assertIn("text", event.__dict__)
+        self.assertEqual(event.item, {"ts": "1.0"})
+        self.assertEqual(event["text"], "hi")
+        self.assertTrue("item" in event)
+        self.assertFalse("user" in event)
+        self.assertEqual(event, LazyEvent(dict(data)))
+        self.assertNotEqual(event, LazyEvent({"type": "message"}))
+
+        with self.assertRaises(AttributeError):
+            event.user
+        self.assertEqual(LazyEvent({}).type, "")
+
     def test_value(self):
         data = {"value": "something", "creator": "me", "last_set": 12345}
         value = Value(value="something", creator="me", last_set=12345)
 
         self.assertEqual(Value(**data), value)
         self.assertEqual(Value.build(data), value)
+
+    def test_class_cache(self):
+        cache = ClassCache(maxsize=2)
+
+        one = cache.get(Auto, "One", ["foo", "bar"])
+        self.assertIs(cache.get(Auto, "One", ["bar", "foo"]), one)
+        self.assertIsNot(cache.get(Auto, "Two", ["foo", "bar"]), one)
+        self.assertIsNot(cache.get(Auto, "One", ["foo"]), one)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+        # least recently used entry was evicted
+        self.assertIsNot(cache.get(Auto, "One", ["foo", "bar"]), one)
+
+        a = Auto.generate({"type": "hello", "foo": 1})
+        b = Auto.generate({"foo": 2, "type": "goodbye"})
+        self.assertIs(a.__class__, b.__class__)
+        self.assertEqual(b.foo, 2)
+
+    def test_compact(self):
+        CompactUser = compact(User)
+        self.assertIs(compact(User), CompactUser)
+        self.assertEqual(CompactUser.__name__, "User")
+        self.assertIs(CompactUser.field_names(), CompactUser.field_names())
+        self.assertEqual(CompactUser.field_names(), User.field_names())
+
+        data = {
+            "id": "U1",
+            "team_id": "".join(["T", "1"]),
+            "name": "jim",
+            "profile": {"display_name": "Jimbo"},
+        }
+        user = CompactUser.build(data)
+        self.assertFalse(hasattr(user, "__dict__"))
+        self.assertIsInstance(user.profile, compact(Profile))
+        self.assertEqual(user.profile.display_name, "Jimbo")
+        self.assertEqual(user["name"], "jim")
+        other = CompactUser.build(dict(data, team_id="".join(["T", "1"])))
+        self.assertIs(user.team_id, other.team_id)
+        self.assertIsInstance(
+            CompactUser(id="U2", team_id="T1", name="bob").profile, Auto
+        )